@@ -25,9 +25,39 @@ Example
 </html>
 """
 
-from .htmlclasses import E  # noqa: F401
-from .serialize import to_string  # noqa: F401
+from .compiler import compile, render  # noqa: F401
+from .htmlclasses import E, Frozen, Node, Slot, cacheable  # noqa: F401
+from .profiling import RenderStats, TreeStats, stats  # noqa: F401
+from .query import select  # noqa: F401
+from .serialize import (  # noqa: F401
+        ato_chunks,
+        freeze,
+        iter_chunks,
+        render_into,
+        to_bytes,
+        to_stream,
+        to_string,
+        )
 
-__all__ = ('E', 'to_string')
+__all__ = (
+        'E',
+        'Frozen',
+        'Node',
+        'RenderStats',
+        'Slot',
+        'TreeStats',
+        'ato_chunks',
+        'cacheable',
+        'compile',
+        'freeze',
+        'iter_chunks',
+        'render',
+        'render_into',
+        'select',
+        'stats',
+        'to_bytes',
+        'to_stream',
+        'to_string',
+        )
 
 __version__ = '0.3.1'
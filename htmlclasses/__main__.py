@@ -0,0 +1,73 @@
+import argparse
+import pathlib
+import sys
+
+from .build import build
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m htmlclasses')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser(
+            'build',
+            description=(
+                'Render pages into HTML files, skipping the ones'
+                + ' whose sources did not change since the last build.'
+            ),
+    )
+    build_parser.add_argument(
+            'targets',
+            nargs='+',
+            metavar='module:attribute[=output.html]',
+            help='Page to render',
+            )
+    build_parser.add_argument(
+            '-o',
+            '--output-dir',
+            type=pathlib.Path,
+            required=True,
+            help='Directory to write the HTML files to',
+            )
+    build_parser.add_argument(
+            '--indent',
+            default='',
+            help='Indent the HTML with the given string',
+            )
+    build_parser.add_argument(
+            '--no-doctype',
+            action='store_true',
+            help='Do not prepend the DOCTYPE html declaration',
+            )
+    build_parser.add_argument(
+            '--workers',
+            type=int,
+            help='Number of processes (default: number of CPUs)',
+            )
+    build_parser.add_argument(
+            '--cache-file',
+            type=pathlib.Path,
+            help='Build cache (default: a file in the output directory)',
+            )
+    args = parser.parse_args(argv)
+
+    try:
+        report = build(
+                args.targets,
+                args.output_dir,
+                indent=args.indent,
+                html_doctype=not args.no_doctype,
+                workers=args.workers,
+                cache_file=args.cache_file,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f'Built: {len(report.built)}, up to date: {len(report.skipped)}')
+    for target, error in report.failed.items():
+        print(f'Failed: {target}: {error}')
+    return 1 if report.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""Benchmarks of building and serializing element trees.
+
+Run with `python -m htmlclasses.bench --help`.
+
+Serialization is measured with the compiled per class output
+bypassed, otherwise only the first render of a tree would count.
+"""
+
+from dataclasses import asdict, dataclass
+from typing import Callable, Iterator
+import json
+import math
+import time
+import tracemalloc
+
+from htmlclasses import E
+from htmlclasses import serialize
+from htmlclasses.lib import svg
+from htmlclasses.lib.table import build_table
+
+DEFAULT_THRESHOLD = 0.2
+
+
+@dataclass(frozen=True)
+class Result:
+
+    seconds: float
+    peak_bytes: int
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    """A named piece of work.
+
+    setup: Prepares whatever should not be measured and
+        returns the zero-argument callable that should.
+    """
+
+    name: str
+    setup: Callable[[], Callable[[], object]]
+
+
+def iter_benchmarks(*, size: int = 10_000, points: int = 100_000):
+    """All the benchmarks, scaled by the given sizes.
+
+    Parameters
+    ----------
+    size: Roughly the number of elements in the synthetic trees.
+    points: Number of points in the SVG plot.
+    """
+
+    yield Benchmark('class_definition', lambda: lambda: _build_list(size))
+
+    for name, build in [
+            ('wide_tree', lambda: _build_list(size)),
+            ('deep_tree', lambda: _build_deep(min(size, 1_000))),
+            ('text_heavy', lambda: _build_text_heavy(size)),
+            ('table', lambda: _build_table(size)),
+            ]:
+        for indent in ['', '  ']:
+            yield Benchmark(
+                    f'{name}_{_indent_name(indent)}',
+                    _render_setup(build, indent),
+            )
+
+    yield Benchmark(
+            'svg_plot',
+            lambda: _svg_plot_benchmark(points),
+    )
+
+    for module in _iter_readme_example_modules():
+        for indent in ['', '    ']:
+            yield Benchmark(
+                    f'readme_{module.__name__.rsplit(".", 1)[-1]}'
+                    + f'_{_indent_name(indent)}',
+                    _render_setup(lambda module=module: module.html, indent),
+            )
+
+
+def run(
+        benchmarks: Iterator[Benchmark],
+        *,
+        repeat: int = 5,
+        ) -> dict[str, Result]:
+    """Measure the fastest of `repeat` runs and the peak memory of one."""
+
+    results = {}
+    for benchmark in benchmarks:
+        function = benchmark.setup()
+
+        seconds = math.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            seconds = min(seconds, time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            function()
+            _, peak_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        results[benchmark.name] = Result(seconds, peak_bytes)
+    return results
+
+
+def compare(
+        results: dict[str, Result],
+        baseline: dict[str, Result],
+        *,
+        threshold: float = DEFAULT_THRESHOLD,
+        ) -> list[str]:
+    """Describe the results worse than the baseline by more than threshold.
+
+    Benchmarks missing from either of them are ignored.
+    """
+
+    regressions = []
+    for name, result in results.items():
+        if (base := baseline.get(name)) is None:
+            continue
+        for field in ('seconds', 'peak_bytes'):
+            new = getattr(result, field)
+            old = getattr(base, field)
+            if new > old * (1 + threshold):
+                regressions.append(f'{name}: {field} went from {old} to {new}')
+    return regressions
+
+
+def save(results: dict[str, Result], path) -> None:
+    with open(path, 'w') as fh:
+        json.dump(
+                {name: asdict(result) for name, result in results.items()},
+                fh,
+                indent=2,
+                sort_keys=True,
+                )
+
+
+def load(path) -> dict[str, Result]:
+    with open(path) as fh:
+        return {
+                name: Result(**result)
+                for name, result in json.load(fh).items()
+        }
+
+
+def _indent_name(indent):
+    return 'indented' if indent else 'compact'
+
+
+def _render_setup(build, indent):
+    def setup():
+        element = build()
+        return lambda: _render_uncompiled(element, indent)
+    return setup
+
+
+def _render_uncompiled(element, indent):
+    if indent:
+        return '\n'.join(
+                indent * line.indent_level + line.text
+                for line in serialize._lines(element)
+        )
+    return ''.join(serialize._compact_pieces(element))
+
+
+def _build_list(size):
+
+    class ul(E):
+
+        for _ in range(size):
+
+            class li(E):
+                TEXT = 'item'
+                class_ = 'item'
+
+    return ul
+
+
+def _build_deep(depth):
+    element = E.span('leaf')
+    for i in range(depth):
+
+        class div(E):
+            id = f'level-{i}'
+            child = element
+
+        element = div
+    return element
+
+
+def _build_text_heavy(size):
+
+    class body(E):
+
+        _paragraph = (
+                'Lorem ipsum dolor sit amet & consectetur <adipiscing>. '
+                * 20
+        )
+        for _i in range(size // 10):
+            p = E.p(f'{_i}: {_paragraph}')
+
+    return body
+
+
+def _build_table(size):
+    # Roughly `size` cells.
+    rows = [(i, f'name {i}', i / 7, i % 2 == 0) for i in range(size // 4)]
+    return build_table(rows, header=['id', 'name', 'ratio', 'even'])
+
+
+def _svg_plot_benchmark(points):
+    xys = [(i / points * 10, math.sin(i / points * 10)) for i in range(points)]
+
+    def build_and_render():
+        plot = svg.build_plot(
+                points=xys,
+                x_axis_length=400,
+                y_axis_length=300,
+                y_axis_name='sin(x)',
+                x_axis_name='x',
+        )
+        return _render_uncompiled(plot, '')
+
+    return build_and_render
+
+
+def _iter_readme_example_modules() -> Iterator:
+    # The examples live with the tests, so they're only
+    # available when running from the repository.
+    try:
+        from tests.readme_examples.generate_checksums import (
+                iter_example_modules,
+        )
+    except ImportError:
+        return
+    yield from iter_example_modules()
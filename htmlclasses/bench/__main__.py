@@ -0,0 +1,65 @@
+import argparse
+import pathlib
+import sys
+
+from . import DEFAULT_THRESHOLD, compare, iter_benchmarks, load, run, save
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+            prog='python -m htmlclasses.bench',
+            description=(
+                'Measure time and peak memory of building and serializing'
+                + ' trees and compare them with a stored baseline.'
+            ),
+    )
+    parser.add_argument(
+            '--baseline',
+            type=pathlib.Path,
+            default=pathlib.Path('bench_baseline.json'),
+            help='JSON file with the baseline (default: %(default)s)',
+            )
+    parser.add_argument(
+            '--save',
+            action='store_true',
+            help='Store the results as the new baseline',
+            )
+    parser.add_argument(
+            '--threshold',
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help='Allowed relative regression (default: %(default)s)',
+            )
+    parser.add_argument('--size', type=int, default=10_000)
+    parser.add_argument('--points', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run(
+            iter_benchmarks(size=args.size, points=args.points),
+            repeat=args.repeat,
+    )
+    for name, result in results.items():
+        print(
+                f'{name:<48} {result.seconds * 1000:>10.2f} ms'
+                + f' {result.peak_bytes / 2 ** 20:>10.2f} MiB'
+                )
+
+    if args.save:
+        save(results, args.baseline)
+        print(f'Saved baseline to {args.baseline}')
+        return 0
+
+    if not args.baseline.exists():
+        print(f'No baseline at {args.baseline}, run with --save first.')
+        return 0
+
+    regressions = compare(
+            results, load(args.baseline), threshold=args.threshold)
+    for regression in regressions:
+        print('Regression!', regression)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Render pages to HTML files, skipping the ones that have not changed.
+
+Run with `python -m htmlclasses build --help`.
+
+Pages are rendered in a pool of processes. For every page,
+the cache file in the output directory remembers the source files
+of the modules that were loaded to render it.
+As long as none of them changed and neither did the version
+of this library nor the options, the page is not rendered again.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+import hashlib
+import json
+import os
+import pathlib
+import sys
+import sysconfig
+
+from . import __version__
+from .htmlclasses import Frozen, Node
+from .parallel import _resolve
+from .serialize import to_string
+
+CACHE_FILE_NAME = '.htmlclasses-cache.json'
+
+
+@dataclass
+class BuildReport:
+    """What a build did with each of the targets.
+
+    built: Targets rendered by this build.
+    skipped: Targets whose output was up to date.
+    failed: Error messages of the targets that could not be rendered.
+    """
+
+    built: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+
+
+def build(
+        targets: Iterable[str],
+        output_dir,
+        *,
+        indent: str = '',
+        html_doctype: bool = True,
+        workers: Optional[int] = None,
+        cache_file=None,
+        ) -> BuildReport:
+    """Render pages into HTML files.
+
+    Parameters
+    ----------
+    targets: Pages in the form of 'package.module:attribute',
+        optionally followed by '=path/of/output.html'.
+        The attribute is an E subclass, a Node, a frozen tree
+        or a callable with no parameters returning one of those.
+        The default output path is the module path followed by
+        the attribute name, e.g. 'package/module/attribute.html'.
+    output_dir: Directory the output paths are relative to.
+    indent: Passed to `to_string`.
+    html_doctype: Passed to `to_string`.
+    workers: Number of processes. Defaults to the number of CPUs.
+    cache_file: Where to keep track of what was rendered.
+        Defaults to a file in the output directory.
+
+    Returns
+    -------
+    BuildReport
+    """
+
+    output_dir = pathlib.Path(output_dir)
+    if cache_file is None:
+        cache_file = output_dir / CACHE_FILE_NAME
+    cache_file = pathlib.Path(cache_file)
+
+    options = [indent or '', html_doctype]
+    entries = _load_entries(cache_file, __version__)
+    hashes = _FileHashes()
+    report = BuildReport()
+
+    pages = {}
+    for target in targets:
+        spec, output = _parse_target(target, output_dir)
+        entry = entries.get(target)
+        if (
+                entry is not None
+                and entry['options'] == options
+                and entry['output'] == str(output)
+                and output.exists()
+                and hashes.unchanged(entry['sources'])
+                ):
+            report.skipped.append(target)
+        else:
+            pages[target] = (spec, output)
+
+    if pages:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                    executor.submit(
+                            _render_page, spec, output, indent, html_doctype):
+                    target
+                    for target, (spec, output) in pages.items()
+            }
+            for future in as_completed(futures):
+                target = futures[future]
+                try:
+                    sources = future.result()
+                except Exception as e:
+                    entries.pop(target, None)
+                    report.failed[target] = f'{type(e).__name__}: {e}'
+                    continue
+                entries[target] = dict(
+                        options=options,
+                        output=str(pages[target][1]),
+                        sources={path: hashes[path] for path in sources},
+                        )
+                report.built.append(target)
+
+    _save_entries(cache_file, __version__, entries)
+    return report
+
+
+def _parse_target(target, output_dir):
+    spec, _, output = target.partition('=')
+    module_name, sep, attribute = spec.partition(':')
+    if not sep or not module_name or not attribute:
+        raise ValueError(
+                'Expected target in the form of'
+                + ' "package.module:attribute[=output.html]".'
+                + f' Got: {target!r}'
+        )
+    if not output:
+        output = os.path.join(
+                *module_name.split('.'), attribute + '.html')
+    return spec, output_dir / output
+
+
+def _render_page(spec, output, indent, html_doctype):
+    page = _resolve(spec)
+    if not isinstance(page, (type, Node, Frozen)):
+        page = page()
+    html = to_string(page, indent=indent, html_doctype=html_doctype)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(html, encoding='utf-8')
+    return _loaded_source_files()
+
+
+def _loaded_source_files():
+    # Modules of the standard library and of the installed packages
+    # are covered by the Python installation, hence not tracked.
+    # A worker may have rendered other pages before, so these can be
+    # more files than the page actually needs, which is safe.
+    installed = tuple(
+            path
+            for name in ['stdlib', 'platstdlib', 'purelib', 'platlib']
+            if (path := sysconfig.get_paths().get(name))
+    )
+    sources = set()
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if path and path.endswith('.py') and not path.startswith(installed):
+            sources.add(os.path.abspath(path))
+    return sorted(sources)
+
+
+class _FileHashes(dict):
+    """Hashes of file contents, each computed at most once per build."""
+
+    def __missing__(self, path):
+        try:
+            with open(path, 'rb') as fh:
+                digest = hashlib.sha256(fh.read()).hexdigest()
+        except OSError:
+            digest = None
+        self[path] = digest
+        return digest
+
+    def unchanged(self, hashes):
+        return all(self[path] == digest for path, digest in hashes.items())
+
+
+def _load_entries(cache_file, version):
+    try:
+        with open(cache_file) as fh:
+            cache = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('version') != version:
+        return {}
+    return cache['pages']
+
+
+def _save_entries(cache_file, version, entries):
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_file, 'w') as fh:
+        json.dump(dict(version=version, pages=entries), fh, indent=1)
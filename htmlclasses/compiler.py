@@ -0,0 +1,296 @@
+"""Turn an element into a Python function returning its HTML.
+
+Everything but lazy children and slots is serialized once,
+when the function is generated, and ends up in its source code
+as string constants. Lazy children are serialized every time
+the function is called and slots become its keyword arguments.
+
+Example
+-------
+>>> from htmlclasses import E, Slot, compile, render
+>>> class p(E):
+...     TEXT = 'Hello, '
+...     class b(E):
+...         TEXT = Slot('name', 'stranger')
+...
+>>> render(p, html_doctype=False)
+'<p>Hello, <b>stranger</b></p>'
+>>> render(p, html_doctype=False, name='<you>')
+'<p>Hello, <b>&lt;you&gt;</b></p>'
+>>> compile(p, html_doctype=False)(name='Bob')
+'<p>Hello, <b>Bob</b></p>'
+"""
+
+from typing import Callable, NamedTuple, Type, Union
+import builtins
+
+from .htmlclasses import E, Node, Slot, _escape_attribute_value
+from . import serialize
+
+_COMPILED_RENDERERS = '_compiled_renderers'
+_MISSING = object()
+
+
+def compile(
+        element: Union[Type[E], Node],
+        *,
+        indent: str = '',
+        html_doctype: bool = True,
+        ) -> Callable[..., str]:
+    """Generate a function serializing the element.
+
+    The function is generated once per element class
+    and set of arguments.
+
+    Parameters
+    ----------
+    element: n/c.
+    indent: If it's given the code will be indented accordingly.
+    html_doctype: Whether to prepend the DOCTYPE html declaration.
+
+    Returns
+    -------
+    Function taking values of the slots as keyword arguments
+    and returning the same string `to_string` does
+    when given the same arguments and no values.
+    """
+
+    indent = indent or ''
+    if not isinstance(element, type):
+        return _compile(element, indent, html_doctype)
+
+    # As with the compiled output in `serialize`,
+    # the class `__dict__` is consulted directly so that a subclass
+    # never picks up the functions generated for one of its bases.
+    renderers = element.__dict__.get(_COMPILED_RENDERERS)
+    if renderers is None:
+        renderers = {}
+        setattr(element, _COMPILED_RENDERERS, renderers)
+    key = (indent, html_doctype)
+    try:
+        return renderers[key]
+    except KeyError:
+        renderer = renderers[key] = _compile(element, indent, html_doctype)
+        return renderer
+
+
+def render(
+        template: Union[Type[E], Node],
+        *,
+        indent: str = '',
+        html_doctype: bool = True,
+        **values,
+        ) -> str:
+    """Serialize an element with its slots filled with the given values.
+
+    The element is compiled on the first call, later calls
+    only escape and insert the values.
+    Slots named `indent` or `html_doctype` can only be filled
+    by calling the function returned by `compile`.
+
+    Parameters
+    ----------
+    template: Element containing `Slot`s.
+    indent: If it's given the code will be indented accordingly.
+    html_doctype: Whether to prepend the DOCTYPE html declaration.
+    values: Values of the slots, by name. Slots with no value
+        given get their default.
+
+    Returns
+    -------
+    Valid HTML string.
+    """
+
+    renderer = compile(template, indent=indent, html_doctype=html_doctype)
+    return renderer(**values)
+
+
+class _Lazy(NamedTuple):
+    """Lazy child or slot to be serialized when the function is called."""
+
+    child: object
+    indent_level: int
+
+
+class _AttributeValue(NamedTuple):
+    """Slot to be escaped and inserted when the function is called."""
+
+    slot: Slot
+
+
+def _compile(element, indent, html_doctype):
+    leading_new_line = False
+    if indent:
+        segments = list(_indented_segments(
+                element, indent, indent_level=0, doctype=html_doctype))
+        # Every line starts with a new line character,
+        # except for the very first one. If the first line comes
+        # from a lazy child or a slot, which may give no lines at all,
+        # it's only known once the function is called.
+        if segments and isinstance(segments[0], str):
+            segments[0] = segments[0][1:]
+        else:
+            leading_new_line = True
+    else:
+        segments = []
+        if html_doctype:
+            segments.append(serialize._DOCTYPE_LINE.text)
+        segments.extend(_compact_segments(element))
+
+    namespace = {
+            '_compact_pieces': serialize._compact_pieces,
+            '_indented_lines': _indented_lines,
+            '_escape_attribute_value': _escape_attribute_value,
+            '_indent': indent,
+    }
+    source = _generate_source(
+            _merged(segments), namespace, leading_new_line)
+    # `E(...)` instances have no name of their own.
+    name = getattr(element, '__name__', type(element).__name__)
+    code = builtins.compile(
+            source, f'<htmlclasses.compile {name}>', 'exec')
+    # The source is made of `repr`s of constants and of slot names,
+    # which `Slot` checks to be identifiers, so nothing gets executed
+    # that is not generated here.
+    exec(code, namespace)  # nosec B102
+    return namespace['render']
+
+
+def _compact_segments(element):
+    for piece in serialize._compact_pieces(element, deferred=True):
+        if not isinstance(piece, serialize._Deferred):
+            yield piece
+        elif isinstance(piece.child, (type, Node)):
+            yield from _compact_slotted_element(piece.child)
+        else:
+            yield _Lazy(piece.child, 0)
+
+
+def _compact_slotted_element(element):
+    tag_closing = serialize._build_tag_closing(
+            element.__name__, not element._trees_and_leaves)
+    yield from _tag_opening_segments(element)
+    if serialize._is_pre(element):
+        yield serialize._handle_pre(element, '', tag_closing)
+        return
+    for child in element._trees_and_leaves:
+        yield from _compact_segments(child)
+    yield tag_closing
+
+
+def _indented_segments(element, indent, *, indent_level, doctype=False):
+    lines = serialize._lines(
+            element, indent_level=indent_level, doctype=doctype, deferred=True)
+    for line in lines:
+        if not isinstance(line, serialize._Deferred):
+            yield '\n' + indent * line.indent_level + line.text
+        elif isinstance(line.child, (type, Node)):
+            yield from _indented_slotted_element(
+                    line.child, indent, line.indent_level)
+        else:
+            yield _Lazy(line.child, line.indent_level)
+
+
+def _indented_slotted_element(element, indent, indent_level):
+    tag_closing = serialize._build_tag_closing(
+            element.__name__, not element._trees_and_leaves)
+    yield '\n' + indent * indent_level
+    yield from _tag_opening_segments(element)
+    if serialize._is_pre(element):
+        yield serialize._handle_pre(element, '', tag_closing)
+        return
+    for child in element._trees_and_leaves:
+        yield from _indented_segments(
+                child, indent, indent_level=indent_level + 1)
+    if tag_closing:
+        yield '\n' + indent * indent_level + tag_closing
+
+
+def _tag_opening_segments(element):
+    # Same as `serialize._build_tag_opening`, split around the slots.
+    yield '<' + element.__name__
+    for name, value in element._element_attributes.items():
+        if isinstance(value, Slot):
+            yield f' {name}="'
+            yield _AttributeValue(value)
+            yield '"'
+        else:
+            yield f' {name}="{_escape_attribute_value(value)}"'
+    yield '>' if element._trees_and_leaves else '/>'
+
+
+def _merged(segments):
+    constants = []
+    for segment in segments:
+        if isinstance(segment, str):
+            constants.append(segment)
+            continue
+        if constants:
+            yield ''.join(constants)
+            constants = []
+        yield segment
+    if constants:
+        yield ''.join(constants)
+
+
+def _generate_source(segments, namespace, leading_new_line=False):
+    segments = list(segments)
+    if len(segments) == 1 and isinstance(segments[0], str):
+        # No lazy children nor slots, the whole output is a constant.
+        return f'def render():\n    return {segments[0]!r}\n'
+
+    body = []
+    parameters = {}
+    lazy_count = 0
+    namespace['_missing'] = _MISSING
+    for segment in segments:
+        if isinstance(segment, str):
+            body.append(f'    _parts.append({segment!r})')
+            continue
+
+        if isinstance(segment, _AttributeValue):
+            value = _parameter(segment.slot, parameters, namespace)
+            body.append(
+                    f'    _parts.append(_escape_attribute_value({value}))')
+            continue
+
+        if isinstance(segment.child, Slot):
+            name = _parameter(segment.child, parameters, namespace)
+        else:
+            name = f'_lazy_{lazy_count}'
+            lazy_count += 1
+            namespace[name] = segment.child
+        if namespace['_indent']:
+            call = f'_indented_lines({name}, {segment.indent_level}, _indent)'
+        else:
+            call = f'_compact_pieces({name})'
+        body.append(f'    _parts.extend({call})')
+
+    signature = ', '.join(f'{name}=_missing' for name in parameters)
+    if signature:
+        signature = '*, ' + signature
+    if leading_new_line:
+        result = "''.join(_parts).removeprefix('\\n')"
+    else:
+        result = "''.join(_parts)"
+    return '\n'.join([
+            f'def render({signature}):',
+            '    _parts = []',
+            *body,
+            f'    return {result}',
+            '',
+    ])
+
+
+def _parameter(slot, parameters, namespace):
+    # Slots with the same name share the value but not the default,
+    # so that the output with no values is the same as `to_string`'s.
+    parameters[slot.name] = None
+    default = f'_default_{len(namespace)}'
+    namespace[default] = slot.default
+    return f'({default} if {slot.name} is _missing else {slot.name})'
+
+
+def _indented_lines(child, indent_level, indent):
+    for line in serialize._lines(child, indent_level=indent_level):
+        yield '\n' + indent * line.indent_level + line.text
@@ -1,16 +1,35 @@
+from typing import NamedTuple
+import collections
+import collections.abc
+import enum
+import html
 import inspect
+import keyword
 import types
+import weakref
 
 TREES_AND_LEAVES = '_trees_and_leaves'
 ELEMENT_ATTRIBUTES = '_element_attributes'
+OWN_ELEMENT_ATTRIBUTES = '_own_element_attributes'
+ATTRIBUTES_STRING = '_attributes_string'
+CACHEABLE = '_cacheable'
+STATIC = '_static'
+SHARED = '_shared'
 
 OWNED_ELEMENT_INSTANCES = '_owned_element_instances'
 _TEXT_ATTRIBUTE_NAME = 'TEXT'
 _META_ATTRIBUTE_NAME = 'META'
 
+# Number of `E.<tag>(...)` results kept alive even when unused,
+# so that they can be reused by later calls with the same arguments.
+_FACTORY_CACHE_SIZE = 2 ** 10
+
 
 class _Element:
-    pass
+
+    _cacheable = False
+    _static = True
+    _shared = False
 
 
 def _is_elem_attribute(name):
@@ -24,10 +43,235 @@ def _to_elem_attr_name(name):
     return name.rstrip('_').replace('_', '-')
 
 
+def _build_attributes_string(attributes):
+    """Escaped ` name="value"` pairs ready to be put in a tag opening."""
+    return ''.join(
+            f' {k}="{_escape_attribute_value(v)}"'
+            for k, v in attributes.items()
+            )
+
+
+def _escape_attribute_value(value):
+    return html.escape(_attribute_value(value))
+
+
+def _attribute_value(value):
+    if isinstance(value, Slot):
+        value = value.default
+    return str(value)
+
+
 def _is_elem_class(value):
     return inspect.isclass(value) and issubclass(value, _Element)
 
 
+def _is_lazy(value):
+    # Iterators and callables other than classes are evaluated
+    # only when the serializer gets to them.
+    return (
+            isinstance(value, collections.abc.Iterator)
+            or callable(value) and not inspect.isclass(value)
+            )
+
+
+def _lazy_children(child):
+    """Call or iterate a lazy child to get the children it stands for."""
+    if callable(child):
+        child = child()
+    if isinstance(child, (str, bytes, type, Node, E, Frozen)):
+        return iter((child,))
+    return iter(child)
+
+
+def _is_static(child):
+    """Whether the child serializes the same way every time."""
+    pending = [child]
+    while pending:
+        child = pending.pop()
+        if isinstance(child, (str, bytes)):
+            continue
+        if isinstance(child, Node):
+            pending.extend(child.children)
+        elif isinstance(child, E):
+            pending.extend(child._subelements)
+        elif inspect.isclass(child):
+            if not child._static:
+                return False
+        elif _is_lazy(child):
+            return False
+    return True
+
+
+class Slot:
+    """Placeholder for a value given only when a template is rendered.
+
+    A slot can be a text, a child or an attribute value.
+    Its value is escaped, unless it's an element.
+
+    Example:
+
+        class html(E):
+
+            class body(E):
+
+                class h1(E):
+                    TEXT = Slot('title')
+
+                class a(E):
+                    href = Slot('url', '/')
+                    TEXT = 'Link'
+
+                TEXT = E(Slot('content'))
+
+        render(html, title='Hello', content=Node('p', 'world'))
+
+    Parameters
+    ----------
+    name: Keyword argument the value is given as.
+    default: Value used when none is given,
+        including when the template is passed to `to_string`.
+    """
+
+    __slots__ = ('name', 'default')
+
+    def __init__(self, name, default=''):
+        if (
+                not name.isidentifier()
+                or name.startswith('_')
+                or keyword.iskeyword(name)
+                ):
+            raise ValueError(
+                    'Slot name must be a valid keyword argument name'
+                    + f' not starting with an underscore. Got: {name!r}'
+            )
+        self.name = name
+        self.default = default
+
+    def __call__(self):
+        # Outside of templates a slot is just a lazy child.
+        return self.default
+
+    def __repr__(self):
+        return f'Slot({self.name!r}, {self.default!r})'
+
+
+class Node:
+    """Lightweight element for trees built from data.
+
+    Unlike an `E` subclass, creating a node does not involve
+    creating a class, so it's cheap enough to have one per table cell.
+    Nodes and `E` subclasses can be children of one another.
+
+    Example:
+
+        class table(E):
+
+            for _row in rows:
+                tr = Node('tr', *(Node('td', str(v)) for v in _row))
+
+    Parameters
+    ----------
+    tag: n/c.
+    children: Texts, nodes, `E` subclasses or `E(...)` instances.
+    attributes: Same naming rules as for `E` attributes apply,
+        e.g. `class_` becomes `class`.
+    """
+
+    __slots__ = ('tag', 'children', 'attributes', ATTRIBUTES_STRING)
+
+    # Make nodes look like element classes to the serializer.
+    _cacheable = False
+
+    def __init__(self, tag, *children, **attributes):
+        self.tag = tag
+        self.children = children
+        if attributes:
+            self.attributes = {
+                    _to_elem_attr_name(k): v
+                    for k, v in attributes.items()
+            }
+            self._attributes_string = _build_attributes_string(
+                    self.attributes)
+        else:  # most nodes, e.g. table cells
+            self.attributes = attributes
+            self._attributes_string = ''
+
+    @property
+    def __name__(self):
+        return self.tag
+
+    @property
+    def _trees_and_leaves(self):
+        return self.children
+
+    @property
+    def _element_attributes(self):
+        return self.attributes
+
+    def __repr__(self):
+        args = [repr(self.tag)]
+        args.extend(map(repr, self.children))
+        args.extend(f'{k}={v!r}' for k, v in self.attributes.items())
+        return f'Node({", ".join(args)})'
+
+
+class Opcode(enum.IntEnum):
+    """Kinds of the records of a `Frozen` tree."""
+
+    OPEN = 0  # opening tag of an element with children
+    VOID = 1  # element with no children
+    TEXT = 2  # escaped text
+    CLOSE = 3  # closing tag
+    PRE = 4  # `pre` element along with its text
+
+
+class Tag(NamedTuple):
+    """Value of the OPEN, VOID and PRE records of a `Frozen` tree.
+
+    name: Tag name.
+    attributes: (name, value) pairs, the values converted to strings
+        but not escaped.
+    markup: Serialized opening tag, or the whole element for PRE.
+    """
+
+    name: str
+    attributes: tuple[tuple[str, str], ...]
+    markup: str
+
+
+class Frozen:
+    """Element tree flattened into a sequence of records.
+
+    Created by `freeze`. It can be serialized like an element
+    and be a child of other elements, but it does not keep
+    any of the element classes it was created from alive.
+
+    Records are (opcode, value) pairs, where the value is
+    a `Tag` for OPEN, VOID and PRE and a string for TEXT and CLOSE.
+    The opcodes are kept in one array and indices of the values
+    in another, with equal values stored only once.
+    """
+
+    __slots__ = ('_opcodes', '_operands', '_values', '_index')
+
+    def __init__(self, opcodes, operands, values):
+        self._opcodes = opcodes
+        self._operands = operands
+        self._values = values
+        self._index = None  # built by the first `select` call
+
+    def __len__(self):
+        return len(self._opcodes)
+
+    def __iter__(self):
+        values = self._values
+        for opcode, operand in zip(self._opcodes, self._operands):
+            yield Opcode(opcode), values[operand]
+
+    def __repr__(self):
+        return f'<{type(self).__name__} with {len(self)} records>'
+
+
 def _can_be_converted_to_element_class(name, value):
     # Save a few key strokes by not having to type `class foo(E):`
     # and instead just write `class foo:`.
@@ -58,6 +302,50 @@ def _create_element_class(name, value):
     return new
 
 
+class _Children(collections.abc.Sequence):
+
+    __slots__ = ('_inherited', '_inherited_length', '_own')
+
+    def __init__(self, inherited=()):
+        """Children of the bases followed by the class's own ones.
+
+        The children of the bases are shared, not copied,
+        so creating a subclass costs the same
+        however many children its bases have.
+        """
+        self._inherited = tuple(part for part in inherited if part)
+        self._inherited_length = sum(map(len, self._inherited))
+        self._own = []
+
+    def append(self, child):
+        self._own.append(child)
+
+    def __len__(self):
+        return self._inherited_length + len(self._own)
+
+    def __iter__(self):
+        # Long chains of subclasses make for deeply nested parts,
+        # so they are walked with a stack rather than recursively.
+        stack = [iter((self,))]
+        while stack:
+            part = next(stack[-1], None)
+            if part is None:
+                stack.pop()
+            elif isinstance(part, _Children):
+                stack.append(iter(part._inherited + (part._own,)))
+            else:
+                yield from part
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    def __reversed__(self):
+        return reversed(tuple(self))
+
+    def __repr__(self):
+        return f'{type(self).__name__}({list(self)!r})'
+
+
 class _DictForCollectingElements(dict):
 
     def __init__(self):
@@ -69,50 +357,167 @@ class _DictForCollectingElements(dict):
         HTML elements, we have to circumvent this constraint.
         """
         super().__init__()
-        self[TREES_AND_LEAVES] = []
-        self[ELEMENT_ATTRIBUTES] = {}
+        self[TREES_AND_LEAVES] = _Children()
+        self[OWN_ELEMENT_ATTRIBUTES] = {}
 
     def __setitem__(self, name, value):
-        if _is_elem_class(value) or name == _TEXT_ATTRIBUTE_NAME:
+        if (
+                _is_elem_class(value)
+                or isinstance(value, (Node, Frozen))
+                or name == _TEXT_ATTRIBUTE_NAME
+                ):
             self[TREES_AND_LEAVES].append(value)
         elif _can_be_converted_to_element_class(name, value):
             self[name] = _create_element_class(name, value)
+        elif (
+                _is_elem_attribute(name)
+                and _is_lazy(value)
+                and not isinstance(value, Slot)
+                ):
+            self[TREES_AND_LEAVES].append(value)
         elif _is_elem_attribute(name):
-            self[ELEMENT_ATTRIBUTES][_to_elem_attr_name(name)] = value
+            self[OWN_ELEMENT_ATTRIBUTES][_to_elem_attr_name(name)] = value
         else:
             super().__setitem__(name, value)
 
 
+class _Attributes(collections.abc.Mapping):
+
+    __slots__ = ('_values', '_parts')
+
+    def __init__(self, cls, bases):
+        """Element attributes of a class, sharing those of its bases.
+
+        Rather than merging the attributes of the bases,
+        the values are looked up along the MRO, like Python does
+        for the class attributes themselves.
+        The names come in the order of the bases they are
+        first defined in, followed by the class's own ones.
+        """
+        self._values = collections.ChainMap(*(
+                klass.__dict__[OWN_ELEMENT_ATTRIBUTES]
+                for klass in cls.__mro__
+                if klass.__dict__.get(OWN_ELEMENT_ATTRIBUTES)
+        ))
+        self._parts = tuple(
+                attributes
+                for attributes in (
+                    *(getattr(base, ELEMENT_ATTRIBUTES, None)
+                      for base in bases),
+                    cls.__dict__.get(OWN_ELEMENT_ATTRIBUTES),
+                )
+                if attributes
+        )
+
+    def __getitem__(self, name):
+        return self._values[name]
+
+    def __len__(self):
+        return len(self._values)
+
+    def __bool__(self):
+        return any(self._values.maps)
+
+    def __iter__(self):
+        # Long chains of subclasses make for deeply nested parts,
+        # so they are walked with a stack rather than recursively.
+        seen = set()
+        stack = [iter(self._parts)]
+        while stack:
+            part = next(stack[-1], None)
+            if part is None:
+                stack.pop()
+            elif isinstance(part, _Attributes):
+                stack.append(iter(part._parts))
+            else:
+                for name in part:
+                    if name not in seen:
+                        seen.add(name)
+                        yield name
+
+    def __repr__(self):
+        return f'{type(self).__name__}({dict(self)!r})'
+
+
 class _Meta(type):
 
     @classmethod
     def __prepare__(mcs, name, bases, **kwargs):
         d = _DictForCollectingElements()
-        children_of_bases = sum(
-                [getattr(base, TREES_AND_LEAVES, []) for base in bases],
-                [],
-                )
-        d[TREES_AND_LEAVES].extend(children_of_bases)
-
-        base_element_attributes = {
-                k: v
-                for base in bases
-                for k, v in getattr(base, ELEMENT_ATTRIBUTES, {}).items()
-        }
-        d[ELEMENT_ATTRIBUTES] = base_element_attributes
-
+        d[TREES_AND_LEAVES] = _Children(
+                getattr(base, TREES_AND_LEAVES, ()) for base in bases)
         return d
 
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        cls = super().__new__(mcs, name, bases, namespace, **kwargs)
+        cls._element_attributes = _Attributes(cls, bases)
+        cls._attributes_string = _get_attributes_string(cls, bases)
+        # Only static elements can have their output compiled or cached.
+        cls._static = (
+                all(getattr(base, STATIC, True) for base in bases)
+                and all(map(_is_static, namespace[TREES_AND_LEAVES]._own))
+                )
+        return cls
+
     def __getattr__(cls, name):
         def factory(text, **attributes):
-            namespace = _DictForCollectingElements()
-            namespace[_TEXT_ATTRIBUTE_NAME] = text
-            for k, v in attributes.items():
-                namespace[k] = v
-            return type(name, (E,), namespace)
+            return _get_factory_element(name, text, attributes)
         return factory
 
 
+def _get_factory_element(name, text, attributes):
+    # Classes are immutable in practice, so calls with the same
+    # arguments can share a single class rather than create one each.
+    # Types are part of the key because e.g. 1 == True == 1.0,
+    # yet they are serialized differently.
+    key = (
+            name,
+            type(text),
+            text,
+            tuple((k, type(v), v) for k, v in attributes.items()),
+    )
+    try:
+        element = _factory_elements.get(key)
+    except TypeError:  # unhashable arguments
+        return _create_factory_element(name, text, attributes)
+
+    if element is None:
+        element = _create_factory_element(name, text, attributes)
+        _factory_elements[key] = element
+    _recent_factory_elements.append(element)
+    return element
+
+
+def _create_factory_element(name, text, attributes):
+    namespace = _DictForCollectingElements()
+    namespace[_TEXT_ATTRIBUTE_NAME] = text
+    for k, v in attributes.items():
+        namespace[k] = v
+    return type(name, (E,), namespace)
+
+
+_factory_elements = weakref.WeakValueDictionary()
+_recent_factory_elements = collections.deque(maxlen=_FACTORY_CACHE_SIZE)
+
+
+def _get_attributes_string(cls, bases):
+    # The attributes are serialized and escaped once per class.
+    # A class with no attributes of its own that inherits them
+    # from a single base can share the string of that base.
+    bases_with_attributes = [
+            base for base in bases if getattr(base, ELEMENT_ATTRIBUTES, None)
+    ]
+    if (
+            len(bases_with_attributes) <= 1
+            and not cls.__dict__.get(OWN_ELEMENT_ATTRIBUTES)
+            ):
+        return ''.join(
+                getattr(base, ATTRIBUTES_STRING)
+                for base in bases_with_attributes
+                )
+    return _build_attributes_string(cls._element_attributes)
+
+
 class E(_Element, metaclass=_Meta):
     """Subclass this element to create an HTML tree.
 
@@ -133,7 +538,35 @@ class E(_Element, metaclass=_Meta):
 
             class body(E):
                 ...
+
+    Functions and iterators are children too. They are called
+    or iterated only once the serializer gets to them, e.g.:
+
+        class ul(E):
+            rows = (Node('li', row.name) for row in cursor)
+
+    An iterator can be consumed only once, so use a function
+    for elements that are serialized more than once.
     """
 
     def __init__(self, *subelements):
         self._subelements = subelements
+
+
+def cacheable(element):
+    """Mark an element class as worth caching across renders.
+
+    The serialized output of such an element is kept
+    in a cache shared by all renders, so it's only meant for
+    elements repeated on many pages, e.g. headers or navigation bars.
+
+    Example:
+
+        class html(E):
+
+            @cacheable
+            class nav(E):
+                ...
+    """
+    setattr(element, CACHEABLE, True)
+    return element
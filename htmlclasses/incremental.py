@@ -0,0 +1,295 @@
+"""Re-render a tree reusing the output of a similar, previous tree.
+
+Example
+-------
+>>> from htmlclasses import E
+>>> from htmlclasses.incremental import render
+>>> def dashboard(value):
+...     class html(E):
+...         class body(E):
+...             class h1(E):
+...                 TEXT = 'Dashboard'
+...             class p(E):
+...                 TEXT = value
+...     return html
+...
+>>> first = render(dashboard('1'), html_doctype=False)
+>>> second = render(dashboard('2'), first, html_doctype=False)
+>>> second.html
+'<html><body><h1>Dashboard</h1><p>2</p></body></html>'
+>>> second.changes
+[Change(path=(0, 1), html='<p>2</p>')]
+"""
+
+from typing import NamedTuple, Optional, Type
+
+from .htmlclasses import E, Frozen, Node, _is_static, _lazy_children
+from . import serialize
+
+
+class Change(NamedTuple):
+    """An element whose HTML had to be rebuilt.
+
+    path: Indices of the children to follow from the root element
+        to get to the changed one. Texts count as children
+        and the contents of `E(...)` count as children of the element
+        they appear in.
+    html: Serialized element.
+    """
+
+    path: tuple[int, ...]
+    html: str
+
+
+class Render:
+
+    def __init__(self, html, changes, fragment, indent):
+        """Result of `render`, to be passed to the next `render` call.
+
+        html: Serialized tree.
+        changes: Elements that changed since the previous render.
+            Empty for the very first render.
+        """
+        self.html = html
+        self.changes = changes
+        self._fragment = fragment
+        self._indent = indent
+
+
+def render(
+        element: Type[E],
+        previous: Optional[Render] = None,
+        *,
+        indent: str = '',
+        html_doctype: bool = True,
+        ) -> Render:
+    """Serialize an E subclass reusing the output of the previous render.
+
+    The tree is compared with the previous one element by element.
+    Subtrees with the same tags, attributes and texts are not serialized
+    again, their previous output is reused.
+
+    Parameters
+    ----------
+    element: n/c.
+    previous: Result of rendering the previous version of the tree.
+    indent: If it's given the code will be indented accordingly.
+    html_doctype: Whether to prepend the DOCTYPE html declaration.
+
+    Returns
+    -------
+    Render with the same HTML string `to_string` returns
+    and the changes since the previous render.
+    """
+
+    indent = indent or ''
+    if previous is not None and previous._indent == indent:
+        previous_fragment = previous._fragment
+    else:
+        previous_fragment = None
+
+    changes = []
+    fragment = _Renderer(indent, changes).render(
+            element, previous_fragment, path=(), indent_level=0)
+
+    html = fragment.text
+    if html_doctype:
+        html = '<!DOCTYPE html>' + ('\n' if indent else '') + html
+
+    return Render(html, changes, fragment, indent)
+
+
+class _Fragment(NamedTuple):
+
+    element: object
+    text: str
+    children: tuple
+
+
+class _Renderer:
+
+    def __init__(self, indent, changes):
+        """Serialize trees, reusing the fragments of the previous ones.
+
+        The methods building fragments are generators. Rather than
+        calling one another, they yield the generators whose results
+        they need and `_run` sends them the results back.
+        That way deep trees are rendered with an explicit stack,
+        like the other walkers do, instead of recursion.
+        """
+        self._indent = indent
+        self._changes = changes
+
+    def render(self, element, previous, *, path, indent_level):
+        return _run(self._render(
+                element, previous, path=path, indent_level=indent_level))
+
+    def _render(self, element, previous, *, path, indent_level):
+        if previous is None:
+            return (yield self._build(element, indent_level))
+
+        if previous.element is element and _is_static(element):
+            return previous
+
+        if isinstance(element, str):
+            if previous.element == element:
+                return previous
+            return (yield self._build(element, indent_level))
+
+        if isinstance(element, Frozen):
+            return (yield self._rebuild(element, path, indent_level))
+
+        children = _children(element)
+        if not _same_tag_and_shape(previous, element, children):
+            # Lazy children have already been evaluated, so build
+            # from `children` rather than evaluate them again.
+            return (yield self._rebuild(
+                    element,
+                    path,
+                    indent_level,
+                    (yield self._build_children(children, indent_level)),
+                    ))
+
+        changes_so_far = len(self._changes)
+        child_fragments = []
+        texts_changed = False
+        for i, (child, previous_child) in enumerate(
+                zip(children, previous.children)):
+            fragment = yield self._render(
+                    child,
+                    previous_child,
+                    path=path + (i,),
+                    indent_level=indent_level + 1,
+                    )
+            child_fragments.append(fragment)
+            if fragment is not previous_child:
+                texts_changed |= isinstance(child, str)
+
+        if len(self._changes) == changes_so_far and not texts_changed:
+            return _Fragment(element, previous.text, previous.children)
+
+        if texts_changed:
+            # Rather than reporting changed texts on their own,
+            # report the element containing them
+            # (along with any changes within it).
+            del self._changes[changes_so_far:]
+            return (yield self._rebuild(
+                    element, path, indent_level, tuple(child_fragments)))
+
+        return _Fragment(
+                element,
+                self._compose(element, child_fragments, indent_level),
+                tuple(child_fragments),
+                )
+
+    def _rebuild(self, element, path, indent_level, children=None):
+        fragment = yield self._build(element, indent_level, children)
+        self._changes.append(Change(path, fragment.text))
+        return fragment
+
+    def _build(self, element, indent_level, children=None):
+        if isinstance(element, str):
+            return _Fragment(element, self._text(element, indent_level), ())
+
+        if isinstance(element, Frozen):
+            return _Fragment(element, self._frozen(element, indent_level), ())
+
+        if children is None:
+            children = yield self._build_children(
+                    _children(element), indent_level)
+        if serialize._is_pre(element):
+            text = self._indent * indent_level + serialize._handle_pre(
+                    element, *serialize._build_tags(element))
+        else:
+            text = self._compose(element, children, indent_level)
+        return _Fragment(element, text, children)
+
+    def _build_children(self, children, indent_level):
+        fragments = []
+        for child in children:
+            fragments.append((yield self._build(child, indent_level + 1)))
+        return tuple(fragments)
+
+    def _compose(self, element, children, indent_level):
+        tag_opening, tag_closing = serialize._build_tags(element)
+        if not self._indent:
+            return (
+                    tag_opening
+                    + ''.join(child.text for child in children)
+                    + tag_closing
+                    )
+
+        prefix = self._indent * indent_level
+        lines = [prefix + tag_opening]
+        lines.extend(child.text for child in children if child.text)
+        if tag_closing:
+            lines.append(prefix + tag_closing)
+        return '\n'.join(lines)
+
+    def _frozen(self, frozen, indent_level):
+        if not self._indent:
+            return ''.join(serialize._frozen_compact_pieces(frozen))
+        return '\n'.join(
+                self._indent * line.indent_level + line.text
+                for line in serialize._frozen_lines(frozen, indent_level)
+        )
+
+    def _text(self, text, indent_level):
+        if not self._indent:
+            return serialize._escape(text)
+        prefix = self._indent * indent_level
+        return '\n'.join(
+                prefix + serialize._escape(line)
+                for line in text.splitlines()
+        )
+
+
+def _run(task):
+    # Every stack entry is a generator waiting for the result
+    # of the one above it.
+    stack = [task]
+    result = None
+    while stack:
+        try:
+            subtask = stack[-1].send(result)
+        except StopIteration as stop:
+            stack.pop()
+            result = stop.value
+        else:
+            stack.append(subtask)
+            result = None
+    return result
+
+
+def _same_tag_and_shape(previous, element, children):
+    previous_element = previous.element
+    return (
+            not isinstance(previous_element, (str, Frozen))
+            and previous_element.__name__ == element.__name__
+            # Serialized attributes differ whenever the order does,
+            # or values like 1 and True, which are equal.
+            and previous_element._attributes_string
+            == element._attributes_string
+            and len(previous.children) == len(children)
+            and all(
+                isinstance(previous_child.element, str)
+                == isinstance(child, str)
+                for previous_child, child in zip(previous.children, children)
+            )
+    )
+
+
+def _children(element):
+    children = []
+    pending = list(reversed(element._trees_and_leaves))
+    while pending:
+        child = pending.pop()
+        if isinstance(child, E):
+            pending.extend(reversed(child._subelements))
+        elif not isinstance(child, (str, bytes, type, Node, Frozen)):
+            pending.extend(reversed(tuple(_lazy_children(child))))
+        elif isinstance(child, bytes):
+            children.append(child.decode())
+        else:
+            children.append(child)
+    return children
@@ -0,0 +1,99 @@
+from typing import Any, Callable, Iterable, Mapping, Optional, Sequence
+
+from htmlclasses import Node
+
+Formatter = Callable[[Any], str]
+
+
+def build_table(
+        rows: Iterable[Sequence],
+        *,
+        header: Optional[Sequence[str]] = None,
+        formatters: Optional[Mapping[int, Formatter]] = None,
+        **attributes,
+        ) -> Node:
+    """Build a `table` element out of tabular data.
+
+    Cells are nodes rather than classes and the rows are only built
+    while the table is serialized, one at a time,
+    so big tables can be streamed with `iter_chunks` or `to_stream`.
+
+    Example:
+
+        class body(E):
+            table = build_table(
+                    [(1, 'foo'), (2, 'bar')],
+                    header=['id', 'name'],
+                    formatters={0: '#{}'.format},
+                    class_='report',
+            )
+
+    Parameters
+    ----------
+    rows: Sequences of cell values or a 2-D NumPy array.
+        Columns of an array are converted to strings all at once.
+        An iterator of rows can be serialized only once.
+    header: Contents of the `th` cells, if any.
+    formatters: Functions turning the values of the columns
+        with given indices into strings. Other values are passed to `str`.
+    attributes: Attributes of the `table` element.
+
+    Returns
+    -------
+    Node that can be serialized on its own or put in an element.
+    """
+
+    formatters = formatters or {}
+
+    if _is_array(rows):
+        body_rows = _array_rows(rows, formatters)
+    else:
+        body_rows = _sequence_rows(rows, formatters)
+
+    children = []
+    if header is not None:
+        children.append(Node('thead', _row('th', header)))
+    children.append(Node('tbody', body_rows))
+    return Node('table', *children, **attributes)
+
+
+def _is_array(rows):
+    # NumPy is not a dependency, hence no `isinstance` check.
+    return hasattr(rows, 'ndim') and hasattr(rows, 'tolist')
+
+
+def _array_rows(array, formatters):
+    if array.ndim != 2:
+        raise ValueError(
+                f'Expected 2-D array of cells. Got {array.ndim} dimensions.')
+
+    # Columns are converted to Python values in bulk with `tolist`.
+    # Turning those into strings is faster than `astype(str)`
+    # and gives the same strings as rows of Python values would.
+    columns = [
+            list(map(formatters.get(i, str), column.tolist()))
+            for i, column in enumerate(array.T)
+    ]
+
+    def rows():
+        for cells in zip(*columns):
+            yield _row('td', cells)
+
+    return rows
+
+
+def _sequence_rows(rows, formatters):
+
+    def format_cells(cells):
+        for i, value in enumerate(cells):
+            yield formatters.get(i, str)(value)
+
+    def body_rows():
+        for cells in rows:
+            yield _row('td', format_cells(cells))
+
+    return body_rows
+
+
+def _row(cell_tag, cells):
+    return Node('tr', *(Node(cell_tag, cell) for cell in cells))
@@ -0,0 +1,95 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from importlib import import_module
+from typing import Callable, Iterable, Iterator, Mapping, Optional, Union
+import functools
+
+from .serialize import to_string
+
+
+@dataclass(frozen=True)
+class RenderSpec:
+    """What to render in a worker process.
+
+    Element classes defined inside functions cannot be pickled,
+    hence it's the builder that gets sent to the worker
+    and the tree is built there.
+
+    builder: Callable returning an E subclass or its
+        'package.module:attribute' name. A callable must be
+        importable by worker processes, i.e. defined at module level.
+    args: Positional arguments for the builder.
+    kwargs: Keyword arguments for the builder.
+    indent: Passed to `to_string`.
+    html_doctype: Passed to `to_string`.
+    """
+
+    builder: Union[str, Callable]
+    args: tuple = ()
+    kwargs: Mapping = field(default_factory=dict)
+    indent: str = ''
+    html_doctype: bool = True
+
+
+def render_many(
+        specs: Iterable[RenderSpec],
+        *,
+        workers: Optional[int] = None,
+        ordered: bool = True,
+        chunksize: int = 1,
+        ) -> Iterator[tuple[RenderSpec, str]]:
+    """Build and serialize many documents in a pool of processes.
+
+    Parameters
+    ----------
+    specs: Documents to render.
+    workers: Number of processes. Defaults to the number of CPUs.
+    ordered: Whether to yield the results in the order of `specs`
+        or as soon as each of them is ready.
+    chunksize: Number of specs sent to a worker at once
+        when `ordered` is set. Bigger values help with many small pages.
+
+    Returns
+    -------
+    Iterator over (spec, HTML string) pairs.
+    """
+
+    specs = list(specs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if ordered:
+            rendered = executor.map(_render, specs, chunksize=chunksize)
+            yield from zip(specs, rendered)
+        else:
+            futures = {
+                    executor.submit(_render, spec): spec
+                    for spec in specs
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+
+def _render(spec):
+    builder = _resolve(spec.builder)
+    element = builder(*spec.args, **spec.kwargs)
+    return to_string(
+            element,
+            indent=spec.indent,
+            html_doctype=spec.html_doctype,
+            )
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve(builder):
+    if not isinstance(builder, str):
+        return builder
+
+    module_name, sep, attribute_path = builder.partition(':')
+    if not sep or not attribute_path:
+        raise ValueError(
+                'Expected builder name in the form of'
+                + f' "package.module:attribute". Got: {builder!r}'
+        )
+    value = import_module(module_name)
+    for attribute in attribute_path.split('.'):
+        value = getattr(value, attribute)
+    return value
@@ -0,0 +1,447 @@
+"""Find out what a render costs and which elements it spends its time on.
+
+Example
+-------
+>>> from htmlclasses import E, RenderStats, to_string
+>>> class ul(E):
+...     class li(E):
+...         TEXT = 'foo'
+...     class li(E):
+...         TEXT = 'bar'
+...
+>>> stats = RenderStats()
+>>> to_string(ul, html_doctype=False, profiler=stats)
+'<ul><li>foo</li><li>bar</li></ul>'
+>>> stats.by_tag['li'].nodes, stats.by_tag['li'].chars
+(2, 24)
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import NamedTuple, Type, Union
+import time
+
+from .htmlclasses import (
+        E,
+        Frozen,
+        Node,
+        Opcode,
+        _build_attributes_string,
+        _lazy_children,
+        )
+from . import serialize
+
+_STATS_SUMMARY = '_stats_summary'
+
+
+@dataclass
+class ElementStats:
+    """Costs of all the elements with the same tag or class.
+
+    nodes: Number of elements.
+    chars: Characters of tags and texts emitted by the elements,
+        including their descendants but not the indentation.
+    escapes: Number of texts the elements and their descendants escaped.
+    seconds: Time spent serializing the elements and their descendants.
+
+    Elements nested in one with the same tag (or class)
+    only count towards `nodes`, everything else
+    is already included in the outermost one.
+    """
+
+    nodes: int = 0
+    chars: int = 0
+    escapes: int = 0
+    seconds: float = 0.0
+
+
+class RenderStats:
+
+    def __init__(self):
+        """Pass to `to_string` as `profiler` to collect statistics.
+
+        The statistics of all the renders it's passed to add up.
+        Compiled and cached outputs are not used while profiling,
+        so that every element is actually serialized.
+
+        by_tag: ElementStats for every tag name.
+        by_class: ElementStats for every element class.
+            Nodes all count towards `Node`.
+        """
+        self.by_tag = defaultdict(ElementStats)
+        self.by_class = defaultdict(ElementStats)
+
+
+def profiled_pieces(element, indent, profiler):
+    """Same pieces as the serializer walkers yield, with stats collected.
+
+    The unindented output yields strings, the indented one IndentedLines.
+    """
+
+    clock = time.perf_counter
+    counts = _Counts()
+    active = defaultdict(int)
+
+    def text_pieces(text, indent_level):
+        if isinstance(text, bytes):
+            text = text.decode()
+        if not indent:
+            counts.escapes += 1
+            escaped = serialize._escape(text)
+            counts.chars += len(escaped)
+            yield escaped
+            return
+        for line in text.splitlines():
+            counts.escapes += 1
+            escaped = serialize._escape(line)
+            counts.chars += len(escaped)
+            yield serialize.IndentedLine(escaped, indent_level)
+
+    def piece(text, indent_level):
+        counts.chars += len(text)
+        if indent:
+            return serialize.IndentedLine(text, indent_level)
+        return text
+
+    def enter(element):
+        keys = (
+                (profiler.by_tag, element.__name__),
+                # Nodes are not kept alive by the profiler
+                # nor counted one by one, they all share a key.
+                (profiler.by_class, element if isinstance(element, type)
+                 else type(element)),
+        )
+        for stats, key in keys:
+            stats[key].nodes += 1
+            active[key] += 1
+        return keys, clock(), counts.chars, counts.escapes
+
+    def leave(keys, start, chars, escapes):
+        for stats, key in keys:
+            active[key] -= 1
+            if not active[key]:
+                element_stats = stats[key]
+                element_stats.seconds += clock() - start
+                element_stats.chars += counts.chars - chars
+                element_stats.escapes += counts.escapes - escapes
+
+    stack = [(iter((element,)), 0, None, None)]
+    while stack:
+        elements, indent_level, closing, entered = stack[-1]
+        element = next(elements, serialize._EXHAUSTED)
+
+        if element is serialize._EXHAUSTED:
+            stack.pop()
+            if closing:
+                yield piece(closing, indent_level - 1)
+            if entered:
+                leave(*entered)
+            continue
+
+        if isinstance(element, (str, bytes)):
+            yield from text_pieces(element, indent_level)
+            continue
+
+        if isinstance(element, E):
+            stack.append(
+                    (iter(element._subelements), indent_level, None, None))
+            continue
+
+        if isinstance(element, Frozen):
+            # Frozen trees are serialized as a whole,
+            # so their elements are not accounted for individually.
+            if indent:
+                pieces = serialize._frozen_lines(element, indent_level)
+                for line in pieces:
+                    yield piece(line.text, line.indent_level)
+            else:
+                for text in serialize._frozen_compact_pieces(element):
+                    yield piece(text, indent_level)
+            continue
+
+        if not isinstance(element, (type, Node)):
+            stack.append(
+                    (_lazy_children(element), indent_level, None, None))
+            continue
+
+        entered = enter(element)
+        tag_opening, tag_closing = serialize._build_tags(element)
+
+        if serialize._is_pre(element):
+            counts.escapes += any(element._trees_and_leaves)
+            yield piece(
+                    serialize._handle_pre(element, tag_opening, tag_closing),
+                    indent_level,
+                    )
+            leave(*entered)
+            continue
+
+        yield piece(tag_opening, indent_level)
+        stack.append((
+                iter(element._trees_and_leaves),
+                indent_level + 1,
+                tag_closing,
+                entered,
+                ))
+
+
+class _Counts:
+
+    def __init__(self):
+        self.chars = 0
+        self.escapes = 0
+
+
+class TreeStats(NamedTuple):
+    """Size of a tree and of its serialized form.
+
+    nodes: Number of elements, not counting texts.
+    max_depth: Number of elements on the longest path
+        from the root element down.
+    text_bytes: UTF-8 encoded size of the escaped texts.
+    attribute_bytes: UTF-8 encoded size of the ` name="value"` pairs.
+    length: Same as `len(to_string(...))`.
+    size: Same as `len(to_bytes(...))`.
+    """
+
+    nodes: int
+    max_depth: int
+    text_bytes: int
+    attribute_bytes: int
+    length: int
+    size: int
+
+
+def stats(
+        element: Union[Type[E], Node, Frozen],
+        *,
+        indent: str = '',
+        html_doctype: bool = True,
+        ) -> TreeStats:
+    """Measure a tree without serializing it.
+
+    Every element class is measured once and remembered,
+    whatever `indent` the statistics are asked for.
+
+    Parameters
+    ----------
+    element: n/c.
+    indent: Same as for `to_string`.
+    html_doctype: Same as for `to_string`.
+
+    Returns
+    -------
+    TreeStats
+
+    Raises
+    ------
+    ValueError: The tree has lazy children, which cannot be measured
+        without evaluating them.
+    """
+
+    summary = _summarize(element)
+    doctype = serialize._DOCTYPE_LINE.text
+    if indent:
+        # Lines are separated by new lines and prefixed
+        # with the indent repeated as many times as their level.
+        lines = summary.lines + html_doctype
+        length = (
+                summary.line_chars
+                + html_doctype * len(doctype)
+                + lines - 1
+                + len(indent) * summary.levels
+                )
+        size = (
+                summary.line_bytes
+                + html_doctype * len(doctype)
+                + lines - 1
+                + len(indent.encode()) * summary.levels
+                )
+    else:
+        length = summary.compact_chars + html_doctype * len(doctype)
+        size = summary.compact_bytes + html_doctype * len(doctype)
+
+    return TreeStats(
+            nodes=summary.nodes,
+            max_depth=summary.depth,
+            text_bytes=summary.text_bytes,
+            attribute_bytes=summary.attribute_bytes,
+            length=length,
+            size=size,
+            )
+
+
+class _Summary(NamedTuple):
+    """Statistics of a subtree that do not depend on where it sits.
+
+    lines: Number of lines of the indented output.
+    line_chars, line_bytes: Length and size of the lines,
+        without indentation nor new lines.
+    levels: Sum of the indent levels of the lines,
+        relative to the level of the subtree root.
+    """
+
+    nodes: int
+    depth: int
+    text_bytes: int
+    attribute_bytes: int
+    compact_chars: int
+    compact_bytes: int
+    lines: int
+    line_chars: int
+    line_bytes: int
+    levels: int
+
+
+def _summarize(element):
+    # Children are summarized before their parents,
+    # with an explicit stack so that deep trees do not hit
+    # the recursion limit. Every stack entry holds an element,
+    # its children still to be summarized and the summaries so far.
+    root_summaries = []
+    stack = [(None, iter((element,)), root_summaries)]
+    while stack:
+        element, children, summaries = stack[-1]
+        child = next(children, serialize._EXHAUSTED)
+
+        if child is serialize._EXHAUSTED:
+            stack.pop()
+            if element is not None:
+                summary = _summarize_element(element, summaries)
+                if isinstance(element, type):
+                    setattr(element, _STATS_SUMMARY, summary)
+                stack[-1][2].append(summary)
+            continue
+
+        if isinstance(child, (str, bytes)):
+            summaries.append(_summarize_text(child))
+        elif isinstance(child, E):
+            stack.append((None, iter(child._subelements), summaries))
+        elif isinstance(child, Frozen):
+            summaries.append(_summarize_frozen(child))
+        elif not isinstance(child, (type, Node)):
+            raise ValueError(
+                    f'Cannot measure lazy child {child!r}.')
+        elif isinstance(child, type) and _STATS_SUMMARY in child.__dict__:
+            summaries.append(child.__dict__[_STATS_SUMMARY])
+        elif serialize._is_pre(child):
+            summaries.append(_summarize_pre(child))
+        else:
+            stack.append((child, iter(child._trees_and_leaves), []))
+
+    root_summary, = root_summaries
+    return root_summary
+
+
+def _summarize_text(text):
+    if isinstance(text, bytes):
+        text = text.decode()
+    escaped = serialize._escape(text)
+    size = len(escaped.encode())
+    lines = [serialize._escape(line) for line in text.splitlines()]
+    return _Summary(
+            nodes=0,
+            depth=0,
+            text_bytes=size,
+            attribute_bytes=0,
+            compact_chars=len(escaped),
+            compact_bytes=size,
+            lines=len(lines),
+            line_chars=sum(map(len, lines)),
+            line_bytes=sum(len(line.encode()) for line in lines),
+            levels=0,
+            )
+
+
+def _summarize_pre(element):
+    tag_opening, tag_closing = serialize._build_tags(element)
+    text = serialize._handle_pre(element, tag_opening, tag_closing)
+    size = len(text.encode())
+    text_bytes = size - len((tag_opening + tag_closing).encode())
+    return _Summary(
+            nodes=1,
+            depth=1,
+            text_bytes=text_bytes,
+            attribute_bytes=len(element._attributes_string.encode()),
+            compact_chars=len(text),
+            compact_bytes=size,
+            lines=1,
+            line_chars=len(text),
+            line_bytes=size,
+            levels=0,
+            )
+
+
+def _summarize_frozen(frozen):
+    # Frozen trees are summarized from their records,
+    # the output from the very pieces and lines they serialize to.
+    nodes = depth = text_bytes = attribute_bytes = level = 0
+    for opcode, value in frozen:
+        if opcode == Opcode.TEXT:
+            text_bytes += len(value.encode())
+        elif opcode == Opcode.CLOSE:
+            level -= 1
+        else:
+            nodes += 1
+            depth = max(depth, level + 1)
+            attributes = _build_attributes_string(dict(value.attributes))
+            attribute_bytes += len(attributes.encode())
+            if opcode == Opcode.OPEN:
+                level += 1
+            elif opcode == Opcode.PRE:
+                text_bytes += _frozen_pre_text_bytes(value, attributes)
+
+    compact = ''.join(serialize._frozen_compact_pieces(frozen))
+    lines = list(serialize._frozen_lines(frozen, 0))
+    return _Summary(
+            nodes=nodes,
+            depth=depth,
+            text_bytes=text_bytes,
+            attribute_bytes=attribute_bytes,
+            compact_chars=len(compact),
+            compact_bytes=len(compact.encode()),
+            lines=len(lines),
+            line_chars=sum(len(line.text) for line in lines),
+            line_bytes=sum(len(line.text.encode()) for line in lines),
+            levels=sum(line.indent_level for line in lines),
+            )
+
+
+def _frozen_pre_text_bytes(tag, attributes):
+    leaf = serialize._build_tag_opening(tag.name, True, attributes)
+    if tag.markup == leaf:
+        return 0
+    tags = (
+            serialize._build_tag_opening(tag.name, False, attributes)
+            + serialize._build_tag_closing(tag.name, False)
+            )
+    return len(tag.markup.encode()) - len(tags.encode())
+
+
+def _summarize_element(element, children):
+    tag_opening, tag_closing = serialize._build_tags(element)
+    tags = tag_opening + tag_closing
+    tags_chars = len(tags)
+    tags_bytes = len(tags.encode())
+    return _Summary(
+            nodes=1 + sum(child.nodes for child in children),
+            depth=1 + max((child.depth for child in children), default=0),
+            text_bytes=sum(child.text_bytes for child in children),
+            attribute_bytes=(
+                len(element._attributes_string.encode())
+                + sum(child.attribute_bytes for child in children)
+            ),
+            compact_chars=(
+                tags_chars + sum(child.compact_chars for child in children)),
+            compact_bytes=(
+                tags_bytes + sum(child.compact_bytes for child in children)),
+            lines=(
+                1 + bool(tag_closing) + sum(child.lines for child in children)
+            ),
+            line_chars=(
+                tags_chars + sum(child.line_chars for child in children)),
+            line_bytes=(
+                tags_bytes + sum(child.line_bytes for child in children)),
+            # The children are one level deeper.
+            levels=sum(child.levels + child.lines for child in children),
+            )
@@ -0,0 +1,193 @@
+"""Find elements with simple CSS selectors.
+
+Every tree is indexed by tag names, ids, classes and attributes
+the first time it's queried. The index of a frozen tree or
+of an element class is kept for later queries,
+so each of them costs in proportion to the number of matches
+rather than to the size of the tree.
+
+Example
+-------
+>>> from htmlclasses import E, freeze, select
+>>> class body(E):
+...     class a(E):
+...         href = '/'
+...         class_ = 'nav active'
+...     class a(E):
+...         href = '/about'
+...         class_ = 'nav'
+...
+>>> [dict(a.attributes)['href'] for a in select(freeze(body), 'a.nav')]
+['/', '/about']
+>>> select(body, '[href="/about"]')[0]._element_attributes['class']
+'nav'
+"""
+
+from typing import Hashable, NamedTuple, Type, Union
+import re
+
+from .htmlclasses import E, Frozen, Node, Opcode, Tag, _attribute_value
+
+_QUERY_INDEX = '_query_index'
+
+_TAG = re.compile(r'\*|[A-Za-z][\w-]*')
+_PART = re.compile(r'''
+    \#(?P<id>[\w-]+)
+    | \.(?P<class_>[\w-]+)
+    | \[\s*(?P<attribute>[\w:-]+)\s*(?:=\s*(?:
+        "(?P<double_quoted>[^"]*)"
+        | '(?P<single_quoted>[^']*)'
+        | (?P<unquoted>[\w-]+)
+    )\s*)?\]
+''', re.VERBOSE)
+
+
+def select(
+        tree: Union[Type[E], Node, Frozen],
+        selector: str,
+        ) -> list:
+    """Find the elements of a tree matching a selector.
+
+    Supported are tag names, `*`, `#id`, `.class`, `[attribute]`
+    and `[attribute=value]`, with the value quoted or not,
+    as well as combinations of those, e.g. `a.nav[href]`.
+    Combinators and pseudo-classes are not.
+
+    Parameters
+    ----------
+    tree: Element class, node or frozen tree with no lazy children.
+    selector: n/c.
+
+    Returns
+    -------
+    Matching element classes and nodes in document order.
+    Elements of frozen trees are given as their `Tag`s.
+    """
+
+    keys = _parse(selector)
+    entries, positions = _index(tree)
+    if not keys:
+        return [result for _, result in entries]
+
+    # Candidates come from the rarest of the keys,
+    # then the rest of the keys are checked one candidate at a time.
+    candidates = min(
+            (positions.get(key, ()) for key in keys), key=len)
+    results = []
+    for position in candidates:
+        tag, result = entries[position]
+        if keys <= _keys(tag):
+            results.append(result)
+    return results
+
+
+class _Index(NamedTuple):
+    """Elements of a tree and where to find them.
+
+    entries: (tag, element) pairs in document order. For elements
+        of frozen trees the tag is the element.
+    positions: Positions of the entries by every key they match.
+    """
+
+    entries: list[tuple[Tag, object]]
+    positions: dict[Hashable, list[int]]
+
+
+def _parse(selector):
+    selector = selector.strip()
+    match = _TAG.match(selector)
+    keys = set()
+    if match and match.group() != '*':
+        keys.add(('tag', match.group()))
+    position = match.end() if match else 0
+    while position < len(selector):
+        match = _PART.match(selector, position)
+        if match is None:
+            raise ValueError(f'Unsupported selector: {selector!r}')
+        keys.add(_part_key(match))
+        position = match.end()
+    return frozenset(keys)
+
+
+def _part_key(match):
+    if match['id'] is not None:
+        return ('value', 'id', match['id'])
+    if match['class_'] is not None:
+        return ('class', match['class_'])
+    for value in match.group(
+            'double_quoted', 'single_quoted', 'unquoted'):
+        if value is not None:
+            return ('value', match['attribute'], value)
+    return ('attribute', match['attribute'])
+
+
+def _keys(tag):
+    keys = {('tag', tag.name)}
+    for name, value in tag.attributes:
+        keys.add(('attribute', name))
+        keys.add(('value', name, value))
+        if name == 'class':
+            keys.update(('class', token) for token in value.split())
+    return keys
+
+
+def _index(tree):
+    if isinstance(tree, Frozen):
+        if tree._index is None:
+            tree._index = _build_index(tree)
+        return tree._index
+
+    if not isinstance(tree, type):
+        return _build_index(tree)
+
+    # As with the compiled output in `serialize`, the class `__dict__`
+    # is consulted directly so that a subclass never picks up
+    # the index of one of its bases.
+    index = tree.__dict__.get(_QUERY_INDEX)
+    if index is None:
+        index = _build_index(tree)
+        setattr(tree, _QUERY_INDEX, index)
+    return index
+
+
+def _build_index(tree):
+    entries = []
+    positions = {}
+
+    def add(tag, result):
+        for key in _keys(tag):
+            positions.setdefault(key, []).append(len(entries))
+        entries.append((tag, result))
+
+    pending = [tree]
+    while pending:
+        element = pending.pop()
+
+        if isinstance(element, (str, bytes)):
+            continue
+
+        if isinstance(element, E):
+            pending.extend(reversed(element._subelements))
+            continue
+
+        if isinstance(element, Frozen):
+            for opcode, value in element:
+                if opcode in (Opcode.OPEN, Opcode.VOID, Opcode.PRE):
+                    add(value, value)
+            continue
+
+        if not isinstance(element, (type, Node)):
+            raise ValueError(f'Cannot query lazy child {element!r}.')
+
+        tag = Tag(
+                element.__name__,
+                tuple(
+                    (name, _attribute_value(value))
+                    for name, value in element._element_attributes.items()
+                ),
+                '',
+                )
+        add(tag, element)
+        pending.extend(reversed(element._trees_and_leaves))
+
+    return _Index(entries, positions)
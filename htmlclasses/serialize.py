@@ -1,7 +1,42 @@
-from typing import NamedTuple, Type, Union
+from typing import (
+        TYPE_CHECKING,
+        AsyncIterator,
+        IO,
+        Iterator,
+        NamedTuple,
+        Optional,
+        Type,
+        Union,
+        )
+from array import array
+from collections import OrderedDict
+import asyncio
+import functools
 import html
+import itertools
+
+from .htmlclasses import (
+        E,
+        Frozen,
+        Node,
+        Opcode,
+        Slot,
+        Tag,
+        _attribute_value,
+        _lazy_children,
+        )
+
+if TYPE_CHECKING:
+    from .profiling import RenderStats
 
-from .htmlclasses import E
+DEFAULT_CHUNK_SIZE = 2 ** 16
+DEFAULT_ESCAPE_CACHE_SIZE = 2 ** 12
+DEFAULT_YIELD_EVERY = 2 ** 10
+DEFAULT_FRAGMENT_CACHE_SIZE = 2 ** 8
+
+# Longer texts are unlikely to repeat and would make
+# the cache memory usage unpredictable.
+_MAX_CACHED_ESCAPE_LENGTH = 256
 
 
 def to_string(
@@ -9,6 +44,7 @@ def to_string(
         *,
         indent: str = '',
         html_doctype: bool = True,
+        profiler: Optional['RenderStats'] = None,
         ) -> str:
     """Serialize an E instance.
 
@@ -17,20 +53,378 @@ def to_string(
     element: n/c.
     indent: If it's given the code will be indented accordingly.
     html_doctype: Whether to prepend the DOCTYPE html declaration.
+    profiler: RenderStats to collect the costs of the render into.
 
     Returns
     -------
     Valid HTML string.
     """
 
-    lines = _lines(element, doctype=html_doctype)
+    if profiler is not None:
+        return _profiled_to_string(element, indent, html_doctype, profiler)
+
+    if not indent:
+        compact = _compiled_compact(element)
+        if html_doctype:
+            return _DOCTYPE_LINE.text + compact
+        return compact
+
+    lines = _compiled_lines(element)
+    if html_doctype:
+        lines = itertools.chain((_DOCTYPE_LINE,), lines)
+    return '\n'.join(
+        indent * line.indent_level + line.text
+        for line in lines
+    )
+
+
+def _profiled_to_string(element, indent, html_doctype, profiler):
+    from .profiling import profiled_pieces
+
+    pieces = profiled_pieces(element, indent, profiler)
     if indent:
-        return '\n'.join(
-            indent * line.indent_level + line.text
-            for line in lines
-        )
-    else:
-        return ''.join(line.text for line in lines)
+        lines = pieces
+        if html_doctype:
+            lines = itertools.chain((_DOCTYPE_LINE,), lines)
+        return ''.join(_indented_pieces(lines, indent))
+    if html_doctype:
+        pieces = itertools.chain((_DOCTYPE_LINE.text,), pieces)
+    return ''.join(pieces)
+
+
+def to_bytes(
+        element: Type[E],
+        *,
+        indent: str = '',
+        html_doctype: bool = True,
+        ) -> bytes:
+    """Serialize an E instance straight into UTF-8 encoded bytes.
+
+    Parameters
+    ----------
+    element: n/c.
+    indent: If it's given the code will be indented accordingly.
+    html_doctype: Whether to prepend the DOCTYPE html declaration.
+
+    Returns
+    -------
+    Same as `to_string(...).encode()`, without the intermediate string.
+    """
+
+    return b''.join(_binary_pieces(element, indent, html_doctype))
+
+
+def render_into(
+        element: Type[E],
+        buffer: Union[bytearray, memoryview],
+        *,
+        indent: str = '',
+        html_doctype: bool = True,
+        ) -> int:
+    """Serialize an E instance into UTF-8 encoded bytes in the given buffer.
+
+    The output is written from the start of the buffer.
+    Whatever was in the buffer after the output is left as it was,
+    so the same buffer can be reused for many documents.
+
+    Parameters
+    ----------
+    element: n/c.
+    buffer: A bytearray, which grows if the output doesn't fit,
+        or a writable memoryview of bytes, which doesn't.
+    indent: If it's given the code will be indented accordingly.
+    html_doctype: Whether to prepend the DOCTYPE html declaration.
+
+    Returns
+    -------
+    Number of bytes written.
+    """
+
+    can_grow = isinstance(buffer, bytearray)
+    position = 0
+    for piece in _binary_pieces(element, indent, html_doctype):
+        end = position + len(piece)
+        if end > len(buffer) and not can_grow:
+            raise ValueError(
+                    f'Output does not fit into buffer of {len(buffer)} bytes.')
+        buffer[position:end] = piece
+        position = end
+    return position
+
+
+def to_stream(
+        element: Type[E],
+        fp: IO[str],
+        *,
+        indent: str = '',
+        html_doctype: bool = True,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        ) -> None:
+    """Serialize an E instance into a file-like object.
+
+    Parameters
+    ----------
+    element: n/c.
+    fp: Object with a `write` method accepting strings.
+    indent: If it's given the code will be indented accordingly.
+    html_doctype: Whether to prepend the DOCTYPE html declaration.
+    chunk_size: Number of characters passed to each `fp.write` call,
+        except for the last one which may be shorter.
+    """
+
+    for chunk in iter_chunks(
+            element,
+            indent=indent,
+            html_doctype=html_doctype,
+            chunk_size=chunk_size,
+            ):
+        fp.write(chunk)
+
+
+def iter_chunks(
+        element: Type[E],
+        *,
+        indent: str = '',
+        html_doctype: bool = True,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        ) -> Iterator[str]:
+    """Serialize an E instance piece by piece.
+
+    Parameters
+    ----------
+    element: n/c.
+    indent: If it's given the code will be indented accordingly.
+    html_doctype: Whether to prepend the DOCTYPE html declaration.
+    chunk_size: Number of characters in each chunk,
+        except for the last one which may be shorter.
+
+    Returns
+    -------
+    Iterator over chunks of HTML that concatenate to
+    the same string `to_string` returns.
+    """
+
+    chunker = _Chunker(chunk_size)
+    for piece in _streamed_pieces(element, indent, html_doctype):
+        yield from chunker.feed(piece)
+    if rest := chunker.flush():
+        yield rest
+
+
+async def ato_chunks(
+        element: Type[E],
+        *,
+        indent: str = '',
+        html_doctype: bool = True,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        yield_every: int = DEFAULT_YIELD_EVERY,
+        ) -> AsyncIterator[str]:
+    """Serialize an E instance piece by piece without blocking the loop.
+
+    Parameters
+    ----------
+    element: n/c.
+    indent: If it's given the code will be indented accordingly.
+    html_doctype: Whether to prepend the DOCTYPE html declaration.
+    chunk_size: Number of characters in each chunk,
+        except for the last one which may be shorter.
+    yield_every: Number of serialized tags and texts after which
+        control is handed back to the event loop.
+
+    Returns
+    -------
+    Asynchronous iterator over the same chunks `iter_chunks` yields.
+    """
+
+    if yield_every < 1:
+        raise ValueError(
+                f'Yield frequency must be positive. Got: {yield_every}')
+
+    chunker = _Chunker(chunk_size)
+    # The pieces can be a tuple, e.g. of the compiled output.
+    pieces = iter(_streamed_pieces(element, indent, html_doctype))
+    while batch := list(itertools.islice(pieces, yield_every)):
+        for piece in batch:
+            for chunk in chunker.feed(piece):
+                yield chunk
+        await asyncio.sleep(0)
+    if rest := chunker.flush():
+        yield rest
+
+
+class _Chunker:
+
+    def __init__(self, chunk_size):
+        """Cut a stream of strings into chunks of equal size."""
+        if chunk_size < 1:
+            raise ValueError(
+                    f'Chunk size must be positive. Got: {chunk_size}')
+        self._chunk_size = chunk_size
+        self._buffer = []
+        self._buffered = 0
+
+    def feed(self, piece):
+        """Return the chunks filled up by the piece, if any."""
+        self._buffer.append(piece)
+        self._buffered += len(piece)
+        if self._buffered < self._chunk_size:
+            return ()
+
+        size = self._chunk_size
+        data = ''.join(self._buffer)
+        cut = len(data) - len(data) % size
+        self._buffer = [data[cut:]]
+        self._buffered = len(data) - cut
+        return [data[start:start + size] for start in range(0, cut, size)]
+
+    def flush(self):
+        """Return whatever is left in the buffer."""
+        rest = ''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        return rest
+
+
+def escape_cache_info() -> NamedTuple:
+    """Hits, misses and size of the cache of escaped strings."""
+    return _cached_escape.cache_info()
+
+
+def set_escape_cache_size(maxsize: int) -> None:
+    """Replace the cache of escaped strings with an empty one.
+
+    Parameters
+    ----------
+    maxsize: How many escaped strings to remember.
+        Least recently used ones are forgotten first.
+    """
+    global _cached_escape
+    _cached_escape = functools.lru_cache(maxsize=maxsize)(html.escape)
+
+
+_cached_escape = functools.lru_cache(
+        maxsize=DEFAULT_ESCAPE_CACHE_SIZE)(html.escape)
+
+
+def _escape(text):
+    if len(text) > _MAX_CACHED_ESCAPE_LENGTH:
+        return html.escape(text)
+    return _cached_escape(text)
+
+
+def _escape_bytes(data):
+    # Most texts need no escaping and are passed through without a copy.
+    if any(char in data for char in _BYTES_TO_ESCAPE):
+        return html.escape(data.decode()).encode()
+    return data
+
+
+_BYTES_TO_ESCAPE = tuple(char.encode() for char in '&<>"\'')
+
+
+class FragmentCacheInfo(NamedTuple):
+
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+def fragment_cache_info() -> FragmentCacheInfo:
+    """Statistics of the cache of elements marked as `cacheable`."""
+    return _fragment_cache.info()
+
+
+def set_fragment_cache_size(maxsize: int) -> None:
+    """Replace the cache of `cacheable` elements with an empty one.
+
+    Parameters
+    ----------
+    maxsize: How many serialized elements to remember.
+        An element is remembered separately for the unindented output
+        and for every indent level it appears at.
+        Least recently used ones are forgotten first.
+    """
+    global _fragment_cache
+    _fragment_cache = _LRUCache(maxsize)
+
+
+class _LRUCache:
+
+    def __init__(self, maxsize):
+        self._maxsize = maxsize
+        self._data = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self._misses += 1
+            return None
+        self._data.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        if len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+            self._evictions += 1
+
+    def info(self):
+        return FragmentCacheInfo(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                maxsize=self._maxsize,
+                currsize=len(self._data),
+                )
+
+
+_fragment_cache = _LRUCache(DEFAULT_FRAGMENT_CACHE_SIZE)
+
+
+def _cached_compact_fragment(element):
+    key = (element, None)
+    fragment = _fragment_cache.get(key)
+    if fragment is None:
+        fragment = ''.join(_compact_pieces(element, uncached=element))
+        _fragment_cache.put(key, fragment)
+    return fragment
+
+
+def _cached_lines_fragment(element, indent_level):
+    key = (element, indent_level)
+    fragment = _fragment_cache.get(key)
+    if fragment is None:
+        fragment = tuple(_lines(
+                element, indent_level=indent_level, uncached=element))
+        _fragment_cache.put(key, fragment)
+    return fragment
+
+
+def _shared_compact_fragment(element):
+    # Subtrees shared by many trees, see `transform`, are serialized
+    # once and kept on the class, like the compiled output.
+    try:
+        return element.__dict__[_COMPILED_COMPACT]
+    except KeyError:
+        fragment = ''.join(_compact_pieces(element, uncached=element))
+        setattr(element, _COMPILED_COMPACT, fragment)
+        return fragment
+
+
+def _shared_lines_fragment(element):
+    try:
+        return element.__dict__[_COMPILED_LINES]
+    except KeyError:
+        fragment = tuple(_lines(element, uncached=element))
+        setattr(element, _COMPILED_LINES, fragment)
+        return fragment
 
 
 class IndentedLine(NamedTuple):
@@ -39,60 +433,441 @@ class IndentedLine(NamedTuple):
     indent_level: int
 
 
+class _Deferred(NamedTuple):
+    """Lazy child left for whoever consumes the walker output."""
+
+    child: object
+    indent_level: int
+
+
+_DOCTYPE_LINE = IndentedLine('<!DOCTYPE html>', 0)
+_COMPILED_LINES = '_compiled_lines'
+_COMPILED_COMPACT = '_compiled_compact'
+_COMPILED_COMPACT_BYTES = '_compiled_compact_bytes'
+
+
+def _compiled_lines(element):
+    return _compiled(element, _COMPILED_LINES, _compile_lines)
+
+
+def _compiled_compact(element):
+    return _compiled(element, _COMPILED_COMPACT, _compile_compact)
+
+
+def _compiled_compact_bytes(element):
+    return _compiled(element, _COMPILED_COMPACT_BYTES, _compile_compact_bytes)
+
+
+def _compiled(element, name, compile_):
+    # An `E` subclass does not change once `_Meta` has created it,
+    # so its serialized form is computed once and then
+    # kept on the class itself.
+    # The class `__dict__` is consulted directly so that a subclass
+    # never picks up the result compiled for one of its bases.
+    # Elements with lazy children are not compiled
+    # as their output can change from one render to the next.
+    if not isinstance(element, type) or not element._static:
+        return compile_(element)
+    try:
+        return element.__dict__[name]
+    except KeyError:
+        compiled = compile_(element)
+        setattr(element, name, compiled)
+        return compiled
+
+
+def _compile_lines(element):
+    return tuple(_lines(element))
+
+
+def _compile_compact(element):
+    return ''.join(_compact_pieces(element))
+
+
+def _compile_compact_bytes(element):
+    return b''.join(_encoded(_compact_pieces(element, binary=True)))
+
+
+def _encoded(pieces):
+    # Bytes are texts given as bytes and have already been escaped.
+    for piece in pieces:
+        if isinstance(piece, bytes):
+            yield piece
+        else:
+            yield piece.encode()
+
+
+def _binary_pieces(element, indent, html_doctype):
+    # Texts given as bytes are passed through as they are
+    # in the unindented output only.
+    # The indented output is rarely served, so it's fine
+    # for it to be encoded line by line from the compiled lines.
+    if html_doctype:
+        yield _DOCTYPE_BYTES
+    if indent:
+        separator = b'\n' if html_doctype else b''
+        for line in _compiled_lines(element):
+            yield separator + (indent * line.indent_level + line.text).encode()
+            separator = b'\n'
+    else:
+        yield _compiled_compact_bytes(element)
+
+
+_DOCTYPE_BYTES = _DOCTYPE_LINE.text.encode()
+
+
+def _streamed_pieces(element, indent, html_doctype):
+    if indent:
+        lines = _streamed_lines(element)
+        if html_doctype:
+            lines = itertools.chain((_DOCTYPE_LINE,), lines)
+        return _indented_pieces(lines, indent)
+    else:
+        pieces = _streamed_compact_pieces(element)
+        if html_doctype:
+            pieces = itertools.chain((_DOCTYPE_LINE.text,), pieces)
+        return pieces
+
+
+def _streamed_lines(element):
+    # Reuse the compiled lines if there are any,
+    # but do not compile them here: that would keep
+    # the whole document in memory.
+    if isinstance(element, type) and _COMPILED_LINES in element.__dict__:
+        return element.__dict__[_COMPILED_LINES]
+    return _lines(element)
+
+
+def _streamed_compact_pieces(element):
+    if isinstance(element, type) and _COMPILED_COMPACT in element.__dict__:
+        return (element.__dict__[_COMPILED_COMPACT],)
+    return _compact_pieces(element)
+
+
+def _indented_pieces(lines, indent):
+    separator = ''
+    for line in lines:
+        yield separator + indent * line.indent_level + line.text
+        separator = '\n'
+
+
+def _compact_pieces(
+        element: Union[Type[E], E, str, bytes],
+        *,
+        uncached=None,
+        binary=False,
+        deferred=False,
+):
+    # Dedicated walker for the unindented output.
+    # Same traversal as `_lines` but it yields plain strings,
+    # without any per line tuples, and texts are not split into lines
+    # so the new lines within them are kept.
+    #
+    # `uncached` is the element being rendered for the fragment cache
+    # and so must not be looked up in it.
+    #
+    # With `binary` set, texts given as bytes are yielded as
+    # (escaped) bytes, so that they don't have to be decoded
+    # only to be encoded back.
+    #
+    # With `deferred` set, lazy children are not evaluated but yielded
+    # as they are, wrapped in `_Deferred`. So are elements with slots
+    # among their attributes, as their tags are not constant.
+    stack = [(iter((element,)), '')]
+    while stack:
+        elements, tag_closing = stack[-1]
+        element = next(elements, _EXHAUSTED)
+
+        if element is _EXHAUSTED:
+            stack.pop()
+            if tag_closing:
+                yield tag_closing
+            continue
+
+        if isinstance(element, str):
+            yield _escape(element)
+            continue
+
+        if isinstance(element, bytes):
+            if binary:
+                yield _escape_bytes(element)
+            else:
+                yield _escape(element.decode())
+            continue
+
+        if isinstance(element, E):
+            stack.append((iter(element._subelements), ''))
+            continue
+
+        if not isinstance(element, (type, Node)):
+            if isinstance(element, Frozen):
+                yield from _frozen_compact_pieces(element)
+            elif deferred:
+                yield _Deferred(element, 0)
+            else:
+                stack.append((_lazy_children(element), ''))
+            continue
+
+        if deferred and _has_attribute_slots(element):
+            yield _Deferred(element, 0)
+            continue
+
+        if not deferred and _is_cached(element, uncached):
+            yield _cached_compact_fragment(element)
+            continue
+
+        if not deferred and _is_shared(element, uncached):
+            yield _shared_compact_fragment(element)
+            continue
+
+        tag_opening, tag_closing = _build_tags(element)
+
+        if _is_pre(element):
+            yield _handle_pre(element, tag_opening, tag_closing)
+        elif tag_closing:
+            yield tag_opening
+            stack.append((iter(element._trees_and_leaves), tag_closing))
+        else:
+            yield tag_opening
+
+
 def _lines(
-        element: Union[Type[E], E, str],
+        element: Union[Type[E], E, str, bytes],
         *,
         indent_level: int = 0,
         doctype: bool = False,
+        uncached=None,
+        deferred=False,
 ):
     # For the purpose of pretty formatted HTML it's convenient
     # for me to think of it in terms of collections of lines
     # with indent levels.
+    #
+    # The tree is walked with an explicit stack rather than recursion
+    # so that each line is yielded exactly once, however deep it sits,
+    # and deep trees do not hit the recursion limit.
+    # Every stack entry holds the children still to be visited,
+    # their indent level and the line to yield once they are done.
+    #
+    # `uncached` and `deferred` are the same as for `_compact_pieces`.
     if doctype:
-        yield IndentedLine('<!DOCTYPE html>', indent_level)
+        yield _DOCTYPE_LINE._replace(indent_level=indent_level)
 
-    if isinstance(element, str):
-        for line in element.splitlines():
-            yield IndentedLine(html.escape(line), indent_level)
-        return
+    stack = [(iter((element,)), indent_level, None)]
+    while stack:
+        elements, indent_level, closing_line = stack[-1]
+        element = next(elements, _EXHAUSTED)
 
-    if isinstance(element, E):
-        for e in element._subelements:
-            for line in _lines(e, indent_level=indent_level):
-                yield line
-        return
+        if element is _EXHAUSTED:
+            stack.pop()
+            if closing_line:
+                yield closing_line
+            continue
 
-    tag_name = element.__name__
+        if isinstance(element, bytes):
+            element = element.decode()
 
-    is_leaf = not element._trees_and_leaves
-    tag_opening = _build_tag_opening(
-            tag_name, is_leaf, element._element_attributes)
-    tag_closing = _build_tag_closing(tag_name, is_leaf)
+        if isinstance(element, str):
+            for line in element.splitlines():
+                yield IndentedLine(_escape(line), indent_level)
+            continue
+
+        if isinstance(element, E):
+            stack.append((iter(element._subelements), indent_level, None))
+            continue
+
+        if not isinstance(element, (type, Node)):
+            if isinstance(element, Frozen):
+                yield from _frozen_lines(element, indent_level)
+            elif deferred:
+                yield _Deferred(element, indent_level)
+            else:
+                stack.append((_lazy_children(element), indent_level, None))
+            continue
+
+        if deferred and _has_attribute_slots(element):
+            yield _Deferred(element, indent_level)
+            continue
 
-    if tag_name.lower() == 'pre':
-        yield IndentedLine(
-                _handle_pre(element, tag_opening, tag_closing),
-                indent_level,
+        if not deferred and _is_cached(element, uncached):
+            yield from _cached_lines_fragment(element, indent_level)
+            continue
+
+        if not deferred and _is_shared(element, uncached):
+            yield from _shifted(_shared_lines_fragment(element), indent_level)
+            continue
+
+        tag_opening, tag_closing = _build_tags(element)
+
+        if _is_pre(element):
+            yield IndentedLine(
+                    _handle_pre(element, tag_opening, tag_closing),
+                    indent_level,
+                    )
+            continue
+
+        yield IndentedLine(tag_opening, indent_level)
+        if tag_closing:
+            stack.append((
+                    iter(element._trees_and_leaves),
+                    indent_level + 1,
+                    IndentedLine(tag_closing, indent_level),
+                    ))
+
+
+_EXHAUSTED = object()
+
+
+def freeze(element: Union[Type[E], Node]) -> Frozen:
+    """Flatten an element tree into a compact sequence of records.
+
+    The result serializes the same way the element does,
+    so the element classes can be released once it's frozen.
+
+    Parameters
+    ----------
+    element: Tree with no lazy children.
+
+    Returns
+    -------
+    Frozen
+    """
+
+    opcodes = array('B')
+    operands = array('I')
+    indices = {}
+
+    def add(opcode, value):
+        opcodes.append(opcode)
+        operands.append(indices.setdefault(value, len(indices)))
+
+    stack = [(iter((element,)), None)]
+    while stack:
+        elements, tag_closing = stack[-1]
+        element = next(elements, _EXHAUSTED)
+
+        if element is _EXHAUSTED:
+            stack.pop()
+            if tag_closing is not None:
+                add(Opcode.CLOSE, tag_closing)
+            continue
+
+        if isinstance(element, bytes):
+            element = element.decode()
+
+        if isinstance(element, str):
+            add(Opcode.TEXT, _escape(element))
+            continue
+
+        if isinstance(element, E):
+            stack.append((iter(element._subelements), None))
+            continue
+
+        if isinstance(element, Frozen):
+            for opcode, value in element:
+                add(opcode, value)
+            continue
+
+        if not isinstance(element, (type, Node)):
+            raise ValueError(f'Cannot freeze lazy child {element!r}.')
+
+        tag_opening, tag_closing = _build_tags(element)
+        tag = Tag(
+                element.__name__,
+                tuple(
+                    (name, _attribute_value(value))
+                    for name, value in element._element_attributes.items()
+                ),
+                tag_opening,
                 )
-        return
+        if _is_pre(element):
+            add(Opcode.PRE, tag._replace(
+                    markup=_handle_pre(element, tag_opening, tag_closing)))
+        elif tag_closing:
+            add(Opcode.OPEN, tag)
+            stack.append((iter(element._trees_and_leaves), tag_closing))
+        else:
+            add(Opcode.VOID, tag)
+
+    return Frozen(opcodes, operands, tuple(indices))
+
+
+def _frozen_compact_pieces(frozen):
+    # TEXT and CLOSE values are strings ready to be output,
+    # the others are tags with the markup to output.
+    values = frozen._values
+    strings = (Opcode.TEXT, Opcode.CLOSE)
+    for opcode, operand in zip(frozen._opcodes, frozen._operands):
+        value = values[operand]
+        yield value if opcode in strings else value.markup
+
+
+def _frozen_lines(frozen, indent_level):
+    values = frozen._values
+    for opcode, operand in zip(frozen._opcodes, frozen._operands):
+        value = values[operand]
+        if opcode == Opcode.TEXT:
+            for line in value.splitlines():
+                yield IndentedLine(line, indent_level)
+        elif opcode == Opcode.OPEN:
+            yield IndentedLine(value.markup, indent_level)
+            indent_level += 1
+        elif opcode == Opcode.CLOSE:
+            indent_level -= 1
+            yield IndentedLine(value, indent_level)
+        else:
+            yield IndentedLine(value.markup, indent_level)
+
 
-    yield IndentedLine(tag_opening, indent_level)
-    for tree_or_leaf in element._trees_and_leaves:
-        for indented_line in _lines(
-                tree_or_leaf, indent_level=indent_level + 1):
-            yield indented_line
-    if tag_closing:
-        yield IndentedLine(tag_closing, indent_level)
+def _has_attribute_slots(element):
+    return any(
+            isinstance(value, Slot)
+            for value in element._element_attributes.values()
+    )
 
 
-def _build_tag_opening(tag_name, is_leaf, attributes):
-    attrs = ' '.join(
-            f'{k}="{v}"'
-            for k, v in attributes.items()
+def _shifted(lines, indent_level):
+    if not indent_level:
+        return lines
+    return (
+            IndentedLine(line.text, line.indent_level + indent_level)
+            for line in lines
+    )
+
+
+def _is_cached(element, uncached):
+    return (
+            element._cacheable
+            and element._static
+            and element is not uncached
+            )
+
+
+def _is_shared(element, uncached):
+    return (
+            isinstance(element, type)
+            and element._shared
+            and element._static
+            and element is not uncached
             )
 
+
+def _build_tags(element):
+    tag_name = element.__name__
+    is_leaf = not element._trees_and_leaves
+    tag_opening = _build_tag_opening(
+            tag_name, is_leaf, element._attributes_string)
+    tag_closing = _build_tag_closing(tag_name, is_leaf)
+    return tag_opening, tag_closing
+
+
+def _is_pre(element):
+    return element.__name__.lower() == 'pre'
+
+
+def _build_tag_opening(tag_name, is_leaf, attributes_string):
     prefix = '<' + tag_name
-    middle = ' ' + attrs if attrs else ''
+    middle = attributes_string
     if is_leaf:
         suffix = '/>'
     else:
@@ -110,13 +885,15 @@ def _build_tag_closing(tag_name, is_leaf):
 def _handle_pre(element, tag_opening, tag_closing):
     text_list = element._trees_and_leaves
 
-    if not text_list or text_list == ['']:
+    if not text_list or list(text_list) == ['']:
         return tag_opening + tag_closing
-    elif len(text_list) != 1 or not isinstance(text_list[0], str):
+    elif len(text_list) != 1 or not isinstance(text_list[0], (str, bytes)):
         raise NotImplementedError(
                 f'Do now know what to do with {element}.'
                 + ' Is it even legal HTML?'
         )
     else:
         text, = text_list
-        return tag_opening + html.escape(text) + tag_closing
+        if isinstance(text, bytes):
+            text = text.decode()
+        return tag_opening + _escape(text) + tag_closing
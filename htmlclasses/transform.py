@@ -0,0 +1,258 @@
+"""Build modified copies of trees sharing the unmodified subtrees.
+
+Only the elements on the way from the root to the modified ones
+are rebuilt, the others are the very same classes and nodes
+as in the original tree. The output of the shared element classes
+is serialized once and then reused by every tree they are part of,
+so the cost of rendering a modified copy is proportional
+to the modifications rather than to the whole tree.
+
+To that end, the element classes that become children of a copy
+are marked as shared, i.e. their `_shared` attribute is set.
+It's the only change made to the original tree.
+Copies of element classes are direct subclasses of `E`
+with the same name, attributes, children and `META`
+as the originals, but none of their bases.
+
+Example
+-------
+>>> from htmlclasses import E, to_string
+>>> from htmlclasses.transform import transform, with_attributes
+>>> class ul(E):
+...     class li(E):
+...         TEXT = 'Home'
+...     class li(E):
+...         TEXT = 'About'
+...
+>>> def highlight(element):
+...     if list(element._trees_and_leaves) == ['About']:
+...         return with_attributes(element, class_='active')
+...     return element
+...
+>>> to_string(transform(ul, highlight), html_doctype=False)
+'<ul><li>Home</li><li class="active">About</li></ul>'
+"""
+
+from typing import Callable, Optional, Sequence, Type, Union
+
+from .htmlclasses import (
+        OWN_ELEMENT_ATTRIBUTES,
+        SHARED,
+        TREES_AND_LEAVES,
+        E,
+        Node,
+        _build_attributes_string,
+        _DictForCollectingElements,
+        _to_elem_attr_name,
+        cacheable,
+        )
+
+Element = Union[Type[E], Node]
+
+
+def transform(
+        element: Element,
+        visit: Callable[[Element], object],
+        ) -> Optional[Element]:
+    """Copy the tree replacing elements with what `visit` returns.
+
+    Every element is visited after its children, so `visit`
+    gets the element with its children already replaced.
+    Elements that `visit` returns unchanged and whose children
+    are all unchanged are not copied. Element classes kept
+    in a copied element are marked as shared, see the module doc.
+
+    Parameters
+    ----------
+    element: n/c.
+    visit: Function called with every element class and node
+        in the tree. It returns the element itself,
+        a replacement (element, text, etc.) or `None` to remove it.
+        Texts, lazy children and frozen trees are not visited.
+
+    Returns
+    -------
+    Root of the new tree, or whatever `visit` returned for the root.
+    """
+
+    result = []
+    # Every stack entry holds an element, its children,
+    # the children still to be visited, the replacements
+    # of the visited ones and where to put the element's replacement.
+    stack = [_frame(element, result)]
+    while stack:
+        element, children, pending, replaced, siblings = stack[-1]
+        child = next(pending, _EXHAUSTED)
+
+        if child is _EXHAUSTED:
+            stack.pop()
+            if len(replaced) != len(children) or any(
+                    new is not old for new, old in zip(replaced, children)):
+                element = _rebuilt(
+                        element, element._element_attributes, replaced)
+            new = visit(element)
+            if new is not None:
+                siblings.append(new)
+        elif isinstance(child, (type, Node)):
+            stack.append(_frame(child, replaced))
+        else:
+            replaced.append(child)
+
+    return result[0] if result else None
+
+
+def transform_at(
+        element: Element,
+        path: Sequence[int],
+        function: Callable[[Element], object],
+        ) -> Optional[Element]:
+    """Copy the tree replacing a single element.
+
+    Only the ancestors of the element are copied. Element classes
+    kept in them are marked as shared, see the module doc.
+
+    Parameters
+    ----------
+    element: n/c.
+    path: Indices of the children to follow from the root element
+        to get to the one to replace, as in `incremental.Change`,
+        except that every lazy child counts as a single child.
+    function: Called with the element at the path, returns
+        its replacement or `None` to remove it.
+
+    Returns
+    -------
+    Root of the new tree, or what `function` returned
+    if the path is empty.
+    """
+
+    spine = [element]
+    for index in path:
+        child = _children(spine[-1])[index]
+        if not isinstance(child, (type, Node)):
+            raise ValueError(
+                    f'Expected element at {tuple(path)!r}. Got: {child!r}')
+        spine.append(child)
+
+    new = function(spine.pop())
+    for index in reversed(path):
+        parent = spine.pop()
+        children = _children(parent)
+        if new is None:
+            del children[index]
+        else:
+            children[index] = new
+        new = _rebuilt(parent, parent._element_attributes, children)
+    return new
+
+
+def with_attributes(element: Element, **attributes) -> Element:
+    """Copy the element with some of its attributes changed.
+
+    The children are shared with the original element,
+    and the element classes among them are marked as such.
+
+    Parameters
+    ----------
+    element: n/c.
+    attributes: Same naming rules as for `E` attributes apply,
+        e.g. `class_` becomes `class`. Attributes set to `None`
+        are removed.
+
+    Returns
+    -------
+    New element class or node.
+    """
+
+    new_attributes = dict(element._element_attributes)
+    for name, value in attributes.items():
+        name = _to_elem_attr_name(name)
+        if value is None:
+            new_attributes.pop(name, None)
+        else:
+            new_attributes[name] = value
+    return _rebuilt(element, new_attributes, element._trees_and_leaves)
+
+
+def with_children(element: Element, *children) -> Element:
+    """Copy the element with its children replaced.
+
+    Element classes among the children are marked as shared.
+
+    Parameters
+    ----------
+    element: n/c.
+    children: Texts, nodes, `E` subclasses or `E(...)` instances,
+        lazy children or frozen trees.
+
+    Returns
+    -------
+    New element class or node.
+    """
+
+    return _rebuilt(element, element._element_attributes, children)
+
+
+_EXHAUSTED = object()
+
+
+def _frame(element, siblings):
+    children = _children(element)
+    return element, children, iter(children), [], siblings
+
+
+def _children(element):
+    # Contents of `E(...)` are children of the element they appear in.
+    # Lazy children are left alone, so as not to evaluate them.
+    children = []
+    pending = list(reversed(element._trees_and_leaves))
+    while pending:
+        child = pending.pop()
+        if isinstance(child, E):
+            pending.extend(reversed(child._subelements))
+        else:
+            children.append(child)
+    return children
+
+
+def _class_namespace(element):
+    # The copy is a direct subclass of `E`, so that attributes
+    # can be removed whichever class they were defined in.
+    # Class attributes other than element contents, e.g. `META`,
+    # are carried over, along with those of the bases.
+    # Private ones are not, as most are caches of the original class.
+    for name in ('__module__', '__qualname__', '__doc__'):
+        if name in element.__dict__:
+            yield name, element.__dict__[name]
+    for klass in reversed(element.__mro__):
+        if klass not in E.__mro__:
+            for name, value in klass.__dict__.items():
+                if not name.startswith('_'):
+                    yield name, value
+
+
+def _rebuilt(element, attributes, children):
+    # Mark the element classes kept from the original tree,
+    # so that the serializer renders them once for all the trees.
+    for child in children:
+        if isinstance(child, type):
+            setattr(child, SHARED, True)
+
+    if isinstance(element, Node):
+        node = Node(element.tag, *children)
+        if attributes:
+            node.attributes = dict(attributes)
+            node._attributes_string = _build_attributes_string(
+                    node.attributes)
+        return node
+
+    namespace = _DictForCollectingElements()
+    for name, value in _class_namespace(element):
+        namespace[name] = value
+    namespace[OWN_ELEMENT_ATTRIBUTES].update(attributes)
+    for child in children:
+        namespace[TREES_AND_LEAVES].append(child)
+    new = type(element.__name__, (E,), namespace)
+    if element._cacheable:
+        cacheable(new)
+    return new
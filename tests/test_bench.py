@@ -0,0 +1,38 @@
+from htmlclasses import bench
+
+
+def test_benchmarks_run_and_results_round_trip(tmp_path):
+    results = bench.run(
+            bench.iter_benchmarks(size=20, points=20),
+            repeat=1,
+    )
+
+    assert {
+            'class_definition',
+            'wide_tree_compact',
+            'deep_tree_indented',
+            'text_heavy_compact',
+            'svg_plot',
+            'readme_example_1_hello_world_indented',
+            } <= set(results)
+    assert all(result.seconds > 0 for result in results.values())
+
+    path = tmp_path / 'baseline.json'
+    bench.save(results, path)
+    assert bench.load(path) == results
+
+
+def test_regressions_beyond_threshold_are_reported():
+    baseline = {
+            'foo': bench.Result(seconds=1.0, peak_bytes=100),
+            'bar': bench.Result(seconds=1.0, peak_bytes=100),
+    }
+    results = {
+            'foo': bench.Result(seconds=1.1, peak_bytes=100),
+            'bar': bench.Result(seconds=1.0, peak_bytes=150),
+            'baz': bench.Result(seconds=9.0, peak_bytes=900),
+    }
+
+    regressions = bench.compare(results, baseline, threshold=0.2)
+
+    assert regressions == ['bar: peak_bytes went from 100 to 150']
@@ -0,0 +1,146 @@
+import textwrap
+
+import pytest
+
+from htmlclasses import build as build_module
+from htmlclasses.__main__ import main
+from htmlclasses.build import CACHE_FILE_NAME, build
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    package = tmp_path / 'src' / 'site_for_build_test'
+    package.mkdir(parents=True)
+    (package / '__init__.py').write_text('')
+    (package / 'layout.py').write_text(textwrap.dedent('''
+            FOOTER = 'footer'
+            '''))
+    (package / 'pages.py').write_text(textwrap.dedent('''
+            from htmlclasses import E, Node, freeze
+            from .layout import FOOTER
+
+            class index(E):
+                TEXT = 'index ' + FOOTER
+
+            def about():
+
+                class html(E):
+                    TEXT = 'about ' + FOOTER
+
+                return html
+
+            frozen = freeze(Node('p', 'frozen ' + FOOTER))
+
+            def broken():
+                raise RuntimeError('oops')
+            '''))
+    monkeypatch.syspath_prepend(str(tmp_path / 'src'))
+    return package
+
+
+TARGETS = [
+        'site_for_build_test.pages:index',
+        'site_for_build_test.pages:about=about/index.html',
+]
+
+
+def read(path):
+    return path.read_text(encoding='utf-8')
+
+
+def test_pages_are_rendered_into_output_dir(site, tmp_path):
+    out = tmp_path / 'out'
+
+    report = build(TARGETS, out, html_doctype=False, workers=2)
+
+    assert sorted(report.built) == sorted(TARGETS)
+    assert read(out / 'site_for_build_test/pages/index.html') == (
+            '<index>index footer</index>')
+    assert read(out / 'about/index.html') == '<html>about footer</html>'
+    assert (out / CACHE_FILE_NAME).exists()
+
+
+def test_frozen_pages_are_rendered(site, tmp_path):
+    out = tmp_path / 'out'
+    target = 'site_for_build_test.pages:frozen=frozen.html'
+
+    report = build([target], out, html_doctype=False, workers=1)
+
+    assert report.built == [target]
+    assert read(out / 'frozen.html') == '<p>frozen footer</p>'
+
+
+def test_unchanged_pages_are_skipped(site, tmp_path):
+    out = tmp_path / 'out'
+    build(TARGETS, out, workers=1)
+
+    report = build(TARGETS, out, workers=1)
+
+    assert (report.built, sorted(report.skipped)) == ([], sorted(TARGETS))
+
+
+def test_pages_are_rebuilt_when_a_module_they_import_changes(site, tmp_path):
+    out = tmp_path / 'out'
+    build(TARGETS, out, html_doctype=False, workers=1)
+
+    (site / 'layout.py').write_text("FOOTER = 'new footer'\n")
+    report = build(TARGETS, out, html_doctype=False, workers=1)
+
+    assert sorted(report.built) == sorted(TARGETS)
+    assert read(out / 'about/index.html') == '<html>about new footer</html>'
+
+
+@pytest.mark.parametrize('change', [
+        dict(indent='  '),
+        dict(html_doctype=False),
+        dict(version='0.0.0'),
+        dict(remove_output=True),
+])
+def test_pages_are_rebuilt_when_anything_else_changes(
+        site, tmp_path, monkeypatch, change):
+    out = tmp_path / 'out'
+    build(TARGETS, out, workers=1)
+
+    if version := change.pop('version', None):
+        monkeypatch.setattr(build_module, '__version__', version)
+    if change.pop('remove_output', False):
+        (out / 'about/index.html').unlink()
+        expected = [TARGETS[1]]
+    else:
+        expected = TARGETS
+
+    report = build(TARGETS, out, workers=1, **change)
+
+    assert sorted(report.built) == sorted(expected)
+
+
+def test_failures_are_reported_and_not_cached(site, tmp_path):
+    out = tmp_path / 'out'
+    targets = TARGETS + ['site_for_build_test.pages:broken']
+
+    report = build(targets, out, workers=1)
+    assert report.failed == {
+            'site_for_build_test.pages:broken': 'RuntimeError: oops'}
+
+    report = build(targets, out, workers=1)
+    assert list(report.failed) == ['site_for_build_test.pages:broken']
+    assert sorted(report.skipped) == sorted(TARGETS)
+
+
+def test_command_line(site, tmp_path, capsys):
+    out = tmp_path / 'out'
+    argv = ['build', *TARGETS, '-o', str(out), '--workers', '1']
+
+    assert main(argv) == 0
+    assert main(argv) == 0
+
+    assert capsys.readouterr().out.splitlines() == [
+            'Built: 2, up to date: 0',
+            'Built: 0, up to date: 2',
+    ]
+    assert read(out / 'about/index.html').startswith('<!DOCTYPE html>')
+
+
+def test_invalid_target_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        build(['no_attribute'], tmp_path)
@@ -0,0 +1,204 @@
+import itertools
+
+import pytest
+
+from htmlclasses import E, Node, Slot, cacheable, compile, render, to_string
+
+
+def build_page():
+    counter = itertools.count()
+
+    @cacheable
+    class nav(E):
+
+        class a(E):
+            href = '/'
+            TEXT = 'Home'
+
+    class html(E):
+
+        class body(E):
+
+            TEXT = E(nav)
+
+            class h1(E):
+                TEXT = 'Title & <subtitle>'
+
+            class ul(E):
+
+                def items():
+                    for i in range(next(counter)):
+                        yield Node('li', str(i))
+
+            class pre(E):
+                TEXT = 'foo\n  bar'
+
+            visits = lambda: f'{next(counter)} visits'  # noqa: E731
+
+            class p(E):
+                TEXT = 'multi\nline'
+
+            class br(E):
+                pass
+
+    return html
+
+
+@pytest.mark.parametrize('indent', ['', '  ', '\t', None])
+@pytest.mark.parametrize('html_doctype', [True, False])
+def test_output_is_same_as_to_string(indent, html_doctype):
+    kwargs = dict(indent=indent, html_doctype=html_doctype)
+    expected_page, actual_page = build_page(), build_page()
+    render = compile(actual_page, **kwargs)
+
+    for _ in range(3):
+        assert render() == to_string(expected_page, **kwargs)
+
+
+def test_static_element_compiles_to_constant():
+
+    class p(E):
+        TEXT = 'foo'
+
+    render = compile(p, html_doctype=False)
+
+    assert render.__code__.co_consts[-1] == '<p>foo</p>'
+    assert render() == '<p>foo</p>'
+
+
+def test_function_is_generated_once_per_class_and_arguments():
+
+    class p(E):
+        TEXT = 'foo'
+
+    class q(p):
+        pass
+
+    assert compile(p) is compile(p)
+    assert compile(p) is not compile(p, indent='  ')
+    assert compile(q)() == '<!DOCTYPE html><q>foo</q>'
+
+
+def test_node_can_be_compiled():
+    rows = lambda: [Node('td', 'foo')]  # noqa: E731
+    render = compile(Node('tr', rows, class_='row'), html_doctype=False)
+
+    assert render() == '<tr class="row"><td>foo</td></tr>'
+
+
+@pytest.mark.parametrize('indent', ['', '  '])
+@pytest.mark.parametrize('element', [
+    E(lambda: 'x'),
+    E(lambda: [], Node('p', 'y')),
+    E(Slot('a', 'z'), 'w'),
+    E(),
+], ids=['lazy', 'empty lazy', 'slot', 'empty'])
+def test_first_line_can_be_lazy(indent, element):
+    render = compile(element, indent=indent, html_doctype=False)
+
+    assert render() == to_string(element, indent=indent, html_doctype=False)
+
+
+def test_first_line_can_be_slot_value():
+    assert render(
+            E(Slot('a')), indent='  ', html_doctype=False, a='hi') == 'hi'
+
+
+class TestSlots:
+
+    @staticmethod
+    def build_template():
+
+        class html(E):
+
+            class body(E):
+
+                class h1(E):
+                    TEXT = Slot('title', 'Untitled')
+
+                class a(E):
+                    href = Slot('url')
+                    title = Slot('title', 'Link title')
+                    TEXT = 'Link'
+
+                class pre(E):
+                    class_ = Slot('pre_class')
+                    TEXT = 'code'
+
+                class br(E):
+                    id = Slot('br_id')
+
+                TEXT = E('Text: ', Slot('text'), Slot('items'))
+
+        return html
+
+    @pytest.mark.parametrize('indent', ['', '  '])
+    def test_slots_are_filled_with_given_values(self, indent):
+        template = self.build_template()
+
+        class expected(E):
+
+            class body(E):
+
+                class h1(E):
+                    TEXT = 'Hello & bye'
+
+                class a(E):
+                    href = '/?a=1&b=2'
+                    title = 'Hello & bye'
+                    TEXT = 'Link'
+
+                class pre(E):
+                    class_ = 'python'
+                    TEXT = 'code'
+
+                class br(E):
+                    id = 'br'
+
+                TEXT = E('Text: ', '<b>', Node('p', 'foo'), E.p('bar'))
+
+        actual = render(
+                template,
+                indent=indent,
+                title='Hello & bye',
+                url='/?a=1&b=2',
+                pre_class='python',
+                br_id='br',
+                text='<b>',
+                items=[Node('p', 'foo'), E.p('bar')],
+                )
+
+        assert actual == to_string(expected, indent=indent).replace(
+                'expected', 'html')
+
+    @pytest.mark.parametrize('indent', ['', '  '])
+    def test_defaults_are_same_as_to_string(self, indent):
+        template = self.build_template()
+
+        assert render(template, indent=indent) == to_string(
+                template, indent=indent)
+        assert 'Untitled' in to_string(template)
+
+    def test_unknown_slot_is_an_error(self):
+        with pytest.raises(TypeError):
+            render(self.build_template(), titel='Hello')
+
+    def test_template_is_compiled_once(self):
+        template = self.build_template()
+
+        assert render(template, title='foo') != render(template, title='bar')
+        assert compile(template) is compile(template)
+
+    def test_slot_in_class_body_is_an_attribute(self):
+
+        class p(E):
+            title = Slot('title')
+
+        assert render(p, html_doctype=False, title='foo') == (
+                '<p title="foo"/>')
+
+    @pytest.mark.parametrize(
+            'name', ['_private', 'not-identifier', 'class', ''])
+    def test_slot_name_must_be_usable_as_keyword_argument(self, name):
+        with pytest.raises(ValueError):
+            Slot(name)
@@ -1,7 +1,11 @@
+from collections import deque
+from weakref import WeakValueDictionary
+import gc
 import pytest
 import textwrap
 
-from htmlclasses import E, to_string
+from htmlclasses import E, Node, to_string
+from htmlclasses import htmlclasses
 
 
 def to_str(element):
@@ -130,6 +134,81 @@ def test_deep_inheritence_preserves_all_elements():
             '<body><p>foo</p><p>bar</p><p>baz</p><p>qux</p></body>')
 
 
+def test_subclass_shares_rather_than_copies_children_of_bases():
+
+    class base(E):
+
+        class p(E):
+            TEXT = 'foo'
+
+    class body(base):
+
+        class p(E):
+            TEXT = 'bar'
+
+    assert body._trees_and_leaves._inherited == (base._trees_and_leaves,)
+    assert len(body._trees_and_leaves) == 2
+    assert to_str(body) == '<body><p>foo</p><p>bar</p></body>'
+
+
+def test_long_chain_of_subclasses():
+
+    class ul(E):
+        pass
+
+    for i in range(500):
+
+        class ul(ul):  # noqa: F811
+            li = E.li(str(i))
+
+    assert len(ul._trees_and_leaves) == 500
+    assert to_str(ul) == (
+            '<ul>' + ''.join(f'<li>{i}</li>' for i in range(500)) + '</ul>')
+
+
+def test_attributes_are_resolved_along_the_mro():
+
+    class A(E):
+        foo = 'a'
+        bar = 'a'
+
+    class B(A):
+        pass
+
+    class C(A):
+        foo = 'c'
+
+    class D(B, C):
+        baz = 'd'
+
+    class F(C, A):
+        bar = 'f'
+
+    assert to_str(D) == '<D foo="c" bar="a" baz="d"/>'
+    assert to_str(F) == '<F foo="c" bar="f"/>'
+
+
+def test_attributes_are_ordered_by_bases_then_own():
+
+    class A(E):
+        a = '1'
+
+    class B(E):
+        b = '2'
+
+    class C(A, B):
+        c = '3'
+
+    class D(B, A):
+        a = '4'
+        d = '5'
+
+    assert to_str(C) == '<C a="1" b="2" c="3"/>'
+    assert to_str(D) == '<D b="2" a="4" d="5"/>'
+    assert list(D._element_attributes.items()) == [
+            ('b', '2'), ('a', '4'), ('d', '5')]
+
+
 def test_reuse():
 
     def get_body(second_p_suffix):
@@ -186,6 +265,34 @@ def test_adding_attributes_with_subclass():
     assert to_str(Y) == '<Y foo="bar" baz="qux"/>'
 
 
+def test_attribute_values_are_escaped():
+
+    class a(E):
+        href = '/?foo=1&bar="2"'
+        title = "<it's>"
+
+    assert to_str(a) == (
+        '<a href="/?foo=1&amp;bar=&quot;2&quot;"'
+        ' title="&lt;it&#x27;s&gt;"/>'
+        )
+
+
+def test_attributes_are_serialized_once_per_class():
+
+    class X(E):
+        foo = 'bar'
+
+    class Y(X):
+        TEXT = 'baz'
+
+    class Z(Y):
+        qux = 'quux'
+
+    assert X._attributes_string == ' foo="bar"'
+    assert Y._attributes_string is X._attributes_string
+    assert Z._attributes_string == ' foo="bar" qux="quux"'
+
+
 def test_no_need_to_subclass():
 
     class foo(E):
@@ -515,3 +622,99 @@ def test_meta_attribute_has_special_treatment():
     assert p.META == 'this is meta'
     assert p._p.META == 'so is this'
     assert p._p._div.META == dict(a=1, b=2)
+
+
+class TestNode:
+
+    def test_nodes_are_serialized_like_element_classes(self):
+
+        class table(E):
+
+            class_ = 'data'
+
+            for _row in [(1, 2), (3, '<4>')]:
+                tr = Node('tr', *(Node('td', str(v)) for v in _row))
+
+            tr = Node('tr', Node('td', class_='empty', data_x='"'))
+
+        assert to_str(table) == (
+                '<table class="data">'
+                '<tr><td>1</td><td>2</td></tr>'
+                '<tr><td>3</td><td>&lt;4&gt;</td></tr>'
+                '<tr><td class="empty" data-x="&quot;"/></tr>'
+                '</table>'
+                )
+
+    def test_nodes_and_element_classes_mix(self):
+
+        class p(E):
+            TEXT = 'foo'
+
+        class div(E):
+            TEXT = E('bar', Node('span', 'baz', E.b('qux'), p))
+            child = Node('pre', 'a\nb')
+
+        assert to_string(div, indent='  ', html_doctype=False) == (
+                textwrap.dedent('''
+                <div>
+                  bar
+                  <span>
+                    baz
+                    <b>
+                      qux
+                    </b>
+                    <p>
+                      foo
+                    </p>
+                  </span>
+                  <pre>a
+                b</pre>
+                </div>
+                ''').strip())
+
+    def test_node_can_be_serialized_on_its_own(self):
+        node = Node('p', 'foo', id='bar')
+
+        assert to_str(node) == '<p id="bar">foo</p>'
+        assert repr(node) == "Node('p', 'foo', id='bar')"
+
+    def test_node_has_no_instance_dict(self):
+        with pytest.raises(AttributeError):
+            Node('p').foo = 'bar'
+
+
+class TestFactoryInterning:
+
+    def test_same_arguments_give_same_class(self):
+        assert E.td('foo') is E.td('foo')
+        assert E.td('foo', class_='x') is E.td('foo', class_='x')
+
+    def test_different_arguments_give_different_classes(self):
+        assert E.td('foo') is not E.th('foo')
+        assert E.td('foo') is not E.td('bar')
+        assert E.td('foo', a=1) is not E.td('foo', a=2)
+        assert E.td('foo', a=1, b=2) is not E.td('foo', b=2, a=1)
+
+    def test_equal_values_of_different_types_are_not_confused(self):
+        assert to_str(E.td('foo', a=1)) == '<td a="1">foo</td>'
+        assert to_str(E.td('foo', a=True)) == '<td a="True">foo</td>'
+        assert to_str(E.td('foo', a=1.0)) == '<td a="1.0">foo</td>'
+
+    def test_unhashable_arguments_are_fine(self):
+        td = E.td('foo', a=[1])
+
+        assert td is not E.td('foo', a=[1])
+        assert to_str(td) == '<td a="[1]">foo</td>'
+
+    def test_only_recently_created_unused_classes_are_kept(
+            self, monkeypatch):
+        monkeypatch.setattr(
+                htmlclasses, '_recent_factory_elements', deque(maxlen=2))
+        monkeypatch.setattr(
+                htmlclasses, '_factory_elements', WeakValueDictionary())
+
+        for text in ['a', 'b', 'c']:
+            E.td(text)
+        gc.collect()
+
+        assert len(htmlclasses._factory_elements) == 2
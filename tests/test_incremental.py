@@ -0,0 +1,194 @@
+import sys
+
+import pytest
+
+from htmlclasses import E, Node, freeze, to_string
+from htmlclasses.incremental import Change, render
+
+
+def build_dashboard(*, title='Dashboard', values=('1', '2'), pre='x'):
+
+    class ul(E):
+        pass
+
+    for value in values:
+
+        class ul(ul):  # noqa: F811
+
+            class li(E):
+                TEXT = E('Value:', E.b(value))
+
+    class html(E):
+
+        class body(E):
+
+            class h1(E):
+                TEXT = title
+
+            list_ = ul
+
+            class pre(E):
+                TEXT = pre
+
+    return html
+
+
+@pytest.mark.parametrize('indent', ['', '  '])
+@pytest.mark.parametrize('kwargs', [
+    dict(),
+    dict(title='Other'),
+    dict(values=('1', '3')),
+    dict(values=('1', '2', '3')),
+    dict(pre='y'),
+])
+def test_output_is_same_as_to_string(indent, kwargs):
+    first = render(build_dashboard(), indent=indent)
+    dashboard = build_dashboard(**kwargs)
+
+    second = render(dashboard, first, indent=indent)
+
+    assert first.html == to_string(build_dashboard(), indent=indent)
+    assert second.html == to_string(dashboard, indent=indent)
+
+
+def test_there_are_no_changes_on_first_render_or_for_same_tree():
+    first = render(build_dashboard())
+    second = render(build_dashboard(), first)
+
+    assert first.changes == second.changes == []
+
+
+def test_changed_elements_are_reported_with_their_paths():
+    first = render(build_dashboard(), html_doctype=False)
+
+    second = render(
+            build_dashboard(title='Other', values=('1', '3')),
+            first,
+            html_doctype=False,
+            )
+
+    assert second.changes == [
+            Change((0, 0), '<h1>Other</h1>'),
+            Change((0, 1, 1, 1), '<b>3</b>'),
+            ]
+
+
+def test_changed_structure_is_reported_for_the_whole_element():
+    first = render(build_dashboard(), html_doctype=False)
+
+    second = render(
+            build_dashboard(values=('1', '2', '3')),
+            first,
+            html_doctype=False,
+            )
+
+    ul_html = (
+            '<ul><li>Value:<b>1</b></li><li>Value:<b>2</b></li>'
+            + '<li>Value:<b>3</b></li></ul>'
+            )
+    assert second.changes == [Change((0, 1), ul_html)]
+
+
+def test_unchanged_subtrees_are_not_serialized_again(monkeypatch):
+    first = render(build_dashboard(), html_doctype=False)
+    built = []
+
+    from htmlclasses import serialize
+    build_tags = serialize._build_tags
+
+    def recording_build_tags(element):
+        built.append(element.__name__)
+        return build_tags(element)
+
+    monkeypatch.setattr(serialize, '_build_tags', recording_build_tags)
+
+    render(build_dashboard(pre='y'), first, html_doctype=False)
+
+    assert built == ['pre', 'body', 'html']
+
+
+def test_lazy_children_are_evaluated_once_per_render():
+    values = iter(['1', '2', '3'])
+
+    class html(E):
+
+        class p(E):
+            TEXT = E(lambda: next(values))
+
+    first = render(html, html_doctype=False)
+    second = render(html, first, html_doctype=False)
+
+    assert first.html == '<html><p>1</p></html>'
+    assert second.html == '<html><p>2</p></html>'
+    assert second.changes == [Change((0,), '<p>2</p>')]
+
+
+@pytest.mark.parametrize('indent', ['', '  '])
+def test_frozen_children(indent):
+    content = freeze(Node('ul', Node('li', 'a'), Node('li', 'b')))
+
+    def build(frozen):
+
+        class html(E):
+
+            class body(E):
+                TEXT = 'x'
+                list_ = frozen
+
+        return html
+
+    first = render(build(content), indent=indent, html_doctype=False)
+    same = render(build(content), first, indent=indent, html_doctype=False)
+    other = freeze(Node('p', 'c'))
+    second = render(build(other), same, indent=indent, html_doctype=False)
+
+    assert first.html == to_string(
+            build(content), indent=indent, html_doctype=False)
+    assert same.changes == []
+    assert second.html == to_string(
+            build(other), indent=indent, html_doctype=False)
+    assert [change.path for change in second.changes] == [(0, 1)]
+
+
+def test_deep_tree():
+    # Unlike the output, the fragments kept for the next render
+    # grow with the square of the depth, hence a not too deep tree
+    # and no indentation, which would make them grow even faster.
+    depth = 2 * sys.getrecursionlimit()
+
+    def build(leaf):
+        element = Node('b', leaf)
+        for _ in range(depth):
+            element = Node('i', element)
+        return element
+
+    first = render(build('x'))
+    second = render(build('y'), first)
+
+    assert first.html == to_string(build('x'))
+    assert second.html == to_string(build('y'))
+    [change] = second.changes
+    assert change.path == (0,) * depth
+
+
+@pytest.mark.parametrize('first_attributes, second_attributes', [
+    (dict(x=1), dict(x=True)),
+    (dict(x=1), dict(x=1.0)),
+    (dict(a='1', b='2'), dict(b='2', a='1')),
+])
+def test_attributes_are_compared_as_serialized(
+        first_attributes, second_attributes):
+
+    def build(attributes):
+
+        class html(E):
+            p = E.p('x', **attributes)
+
+        return html
+
+    first = render(build(first_attributes), html_doctype=False)
+    second = render(build(second_attributes), first, html_doctype=False)
+
+    expected = to_string(build(second_attributes), html_doctype=False)
+    assert second.html == expected
+    assert second.changes == [Change((0,), expected[len('<html>'):-7])]
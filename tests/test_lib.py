@@ -2,7 +2,7 @@ import numpy as np
 import pytest
 
 from htmlclasses import E, to_string
-from htmlclasses.lib import svg
+from htmlclasses.lib import svg, table
 
 
 def show(svg_stuff):
@@ -68,3 +68,49 @@ def test_2_plots():
 
 
 # TODO: add test for META
+
+
+class TestTable:
+
+    def test_table_from_rows(self):
+        tab = table.build_table(
+                [(1, 'foo'), (2, '<bar>')],
+                header=['id', 'name'],
+                formatters={0: '#{}'.format},
+                class_='report',
+                )
+
+        assert to_string(tab, html_doctype=False) == (
+                '<table class="report">'
+                '<thead><tr><th>id</th><th>name</th></tr></thead>'
+                '<tbody>'
+                '<tr><td>#1</td><td>foo</td></tr>'
+                '<tr><td>#2</td><td>&lt;bar&gt;</td></tr>'
+                '</tbody></table>'
+                )
+
+    def test_table_from_array_is_same_as_from_rows(self):
+        array = np.array([[1.5, 2, 1e20], [0.1, -3, 1 / 3]])
+        formatters = {1: '{:.0f}'.format}
+
+        from_array = table.build_table(array, formatters=formatters)
+        from_rows = table.build_table(array.tolist(), formatters=formatters)
+
+        assert to_string(from_array, indent='  ') == (
+                to_string(from_rows, indent='  '))
+        assert '<td>3.3333333333333331e-01</td>' not in to_string(from_array)
+        assert '<td>0.3333333333333333</td>' in to_string(from_array)
+
+    def test_array_must_be_2d(self):
+        with pytest.raises(ValueError):
+            table.build_table(np.arange(3))
+
+    def test_table_can_be_put_in_element_and_rendered_repeatedly(self):
+
+        class body(E):
+            tab = table.build_table([['a']])
+
+        assert to_string(body, html_doctype=False) == to_string(
+                body, html_doctype=False) == (
+                '<body><table><tbody><tr><td>a</td></tr></tbody>'
+                '</table></body>')
@@ -0,0 +1,62 @@
+import pytest
+
+from htmlclasses import E, to_string
+from htmlclasses.parallel import RenderSpec, render_many
+
+
+def build_page(title, *, paragraphs=1):
+
+    class html(E):
+
+        class body(E):
+
+            class h1(E):
+                TEXT = title
+
+    for i in range(paragraphs):
+
+        class html(html):  # noqa: F811
+
+            class p(E):
+                TEXT = str(i)
+
+    return html
+
+
+def test_results_are_rendered_in_order():
+    specs = [
+            RenderSpec(
+                'tests.test_parallel:build_page',
+                args=(f'page {i}',),
+                kwargs=dict(paragraphs=i),
+                indent='  ',
+                )
+            for i in range(5)
+    ]
+
+    results = list(render_many(specs, workers=2))
+
+    assert [spec for spec, _ in results] == specs
+    assert [html for _, html in results] == [
+            to_string(build_page(f'page {i}', paragraphs=i), indent='  ')
+            for i in range(5)
+    ]
+
+
+def test_results_can_be_rendered_as_they_complete():
+    specs = [
+            RenderSpec(build_page, args=(str(i),), html_doctype=False)
+            for i in range(5)
+    ]
+
+    results = list(render_many(specs, workers=2, ordered=False))
+
+    assert sorted(results, key=lambda result: result[0].args) == [
+            (spec, to_string(build_page(spec.args[0]), html_doctype=False))
+            for spec in specs
+    ]
+
+
+def test_builder_name_must_have_a_module_and_an_attribute():
+    with pytest.raises(ValueError):
+        list(render_many([RenderSpec('tests.test_parallel')], workers=1))
@@ -0,0 +1,146 @@
+import pytest
+
+from htmlclasses import E, Node, Slot, freeze, select
+from htmlclasses.htmlclasses import Tag
+
+
+def build_page():
+
+    class html(E):
+
+        class head(E):
+
+            class script(E):
+                src = 'app.js'
+
+        class body(E):
+            id = 'top'
+
+            class a(E):
+                href = '/'
+                class_ = 'nav active'
+                TEXT = 'Home'
+
+            class a(E):
+                href = '/about'
+                class_ = 'nav'
+                TEXT = E('About', E.b('us'))
+
+            rows = Node('ul', Node('li', 'x', data_n=1), class_='list')
+
+            class script(E):
+                TEXT = 'run()'
+
+    return html
+
+
+def names(elements):
+    return [element.__name__ for element in elements]
+
+
+@pytest.mark.parametrize('selector, expected', [
+    ('a', ['/', '/about']),
+    ('.nav', ['/', '/about']),
+    ('a.active', ['/']),
+    ('.active.nav', ['/']),
+    ('[href="/about"]', ['/about']),
+    ("a[href='/']", ['/']),
+    ('[href=/]', None),
+    ('a[ href ]', ['/', '/about']),
+    ('a.missing', []),
+    ('p', []),
+])
+def test_select_by_attributes(selector, expected):
+    html = build_page()
+    if expected is None:
+        with pytest.raises(ValueError):
+            select(html, selector)
+        return
+    assert [
+        a._element_attributes['href'] for a in select(html, selector)
+    ] == expected
+
+
+def test_select_in_document_order():
+    html = build_page()
+    assert names(select(html, 'script')) == ['script', 'script']
+    assert names(select(html, '*')) == [
+        'html', 'head', 'script', 'body', 'a', 'a', 'b', 'ul', 'li',
+        'script']
+
+
+def test_select_nodes_and_contents_of_e_instances():
+    html = build_page()
+    [li] = select(html, 'li[data-n="1"]')
+    assert isinstance(li, Node)
+    assert names(select(html, 'ul.list')) == ['ul']
+    assert names(select(html, 'b')) == ['b']
+    assert select(html, '#top') == list(html._trees_and_leaves)[1:]
+
+
+def test_select_frozen():
+    frozen = freeze(build_page())
+    [script, _] = select(frozen, 'script')
+    assert script == Tag(
+            'script', (('src', 'app.js'),), '<script src="app.js"/>')
+    assert [tag.name for tag in select(frozen, '.nav')] == ['a', 'a']
+    assert select(frozen, '[data-n=1]')[0].name == 'li'
+
+
+def test_select_frozen_child():
+
+    class body(E):
+        content = freeze(Node('p', Node('i', 'x', class_='c')))
+
+    assert [tag.name for tag in select(body, '.c')] == ['i']
+
+
+def test_select_slot_attribute_by_default():
+
+    class a(E):
+        href = Slot('url', '/')
+
+    assert select(a, '[href="/"]') == [a]
+
+
+def test_index_is_built_once(monkeypatch):
+    html = build_page()
+    frozen = freeze(html)
+    assert len(select(html, 'a')) == 2
+    assert len(select(frozen, 'a')) == 2
+
+    def fail(tree):
+        raise AssertionError('Index built again')
+
+    from htmlclasses import query
+    monkeypatch.setattr(query, '_build_index', fail)
+    assert len(select(html, '.nav')) == 2
+    assert len(select(frozen, '#top')) == 1
+
+
+def test_index_of_base_is_not_used_by_subclass():
+    html = build_page()
+    select(html, 'a')
+
+    class page(html):
+
+        class footer(E):
+            pass
+
+    assert names(select(page, 'footer')) == ['footer']
+    assert names(select(html, 'footer')) == []
+
+
+def test_select_lazy_child_raises():
+
+    class ul(E):
+        items = lambda: [Node('li')]  # noqa: E731
+
+    with pytest.raises(ValueError):
+        select(ul, 'li')
+
+
+@pytest.mark.parametrize('selector', ['div p', 'a > b', 'a:hover', 'a,b'])
+def test_unsupported_selector_raises(selector):
+    with pytest.raises(ValueError):
+        select(build_page(), selector)
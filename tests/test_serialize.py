@@ -0,0 +1,785 @@
+import asyncio
+import gc
+import io
+import itertools
+import sys
+import textwrap
+import weakref
+
+import pytest
+
+from htmlclasses import (
+        E,
+        Node,
+        RenderStats,
+        ato_chunks,
+        cacheable,
+        freeze,
+        iter_chunks,
+        render_into,
+        stats,
+        to_bytes,
+        to_stream,
+        to_string,
+        )
+from htmlclasses import serialize
+from htmlclasses.htmlclasses import Tag
+
+
+def to_str(element):
+    return to_string(element, indent=None, html_doctype=False)
+
+
+class TestCompiledLines:
+
+    def test_lines_are_compiled_once_per_class(self, monkeypatch):
+
+        class foo(E):
+
+            class bar(E):
+                TEXT = 'baz'
+
+        assert to_str(foo) == '<foo><bar>baz</bar></foo>'
+        assert to_string(foo, indent=' ') == (
+                '<!DOCTYPE html>\n<foo>\n <bar>\n  baz\n </bar>\n</foo>')
+
+        def fail(*args, **kwargs):
+            raise AssertionError('Should have used the compiled lines.')
+
+        monkeypatch.setattr(serialize, '_lines', fail)
+        monkeypatch.setattr(serialize, '_compact_pieces', fail)
+
+        assert to_str(foo) == '<foo><bar>baz</bar></foo>'
+        assert to_string(foo, indent=' ') == (
+                '<!DOCTYPE html>\n<foo>\n <bar>\n  baz\n </bar>\n</foo>')
+
+    def test_subclass_does_not_reuse_lines_of_base(self):
+
+        class foo(E):
+            TEXT = 'bar'
+
+        assert to_str(foo) == '<foo>bar</foo>'
+
+        class baz(foo):
+            TEXT = 'qux'
+
+        assert to_str(baz) == '<baz>barqux</baz>'
+        assert to_str(foo) == '<foo>bar</foo>'
+
+
+def test_unindented_output_keeps_new_lines_in_text():
+
+    class foo(E):
+
+        TEXT = 'bar\nbaz'
+
+        class pre(E):
+            TEXT = 'qux\n<quux>'
+
+    assert to_str(foo) == '<foo>bar\nbaz<pre>qux\n&lt;quux&gt;</pre></foo>'
+
+
+class TestStreaming:
+
+    @staticmethod
+    def get_tree():
+
+        class html(E):
+
+            class body(E):
+
+                class p(E):
+                    TEXT = 'foo & bar'
+
+                class p(E):  # noqa: F811
+                    TEXT = 'baz\nqux'
+                    class_ = 'quux'
+
+        return html
+
+    @pytest.mark.parametrize('indent', ['', '  '])
+    @pytest.mark.parametrize('chunk_size', [1, 7, 10_000])
+    def test_chunks_add_up_to_the_string(self, indent, chunk_size):
+        html = self.get_tree()
+
+        chunks = list(
+                iter_chunks(html, indent=indent, chunk_size=chunk_size))
+
+        assert ''.join(chunks) == to_string(html, indent=indent)
+        assert all(len(chunk) == chunk_size for chunk in chunks[:-1])
+        assert 0 < len(chunks[-1]) <= chunk_size
+
+    def test_stream_writes_to_file_like_object(self):
+        html = self.get_tree()
+        fp = io.StringIO()
+
+        to_stream(html, fp, indent=' ', html_doctype=False, chunk_size=3)
+
+        assert fp.getvalue() == to_string(
+                html, indent=' ', html_doctype=False)
+
+    def test_chunk_size_must_be_positive(self):
+        with pytest.raises(ValueError):
+            list(iter_chunks(self.get_tree(), chunk_size=0))
+
+
+def test_very_deep_tree_does_not_hit_recursion_limit():
+    depth = sys.getrecursionlimit() + 100
+
+    element = E.i('x')
+    for _ in range(depth):
+
+        class b(E):
+            child = element
+
+        element = b
+
+    actual = to_str(element)
+
+    assert actual == '<b>' * depth + '<i>x</i>' + '</b>' * depth
+
+
+class TestEscapeCache:
+
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self):
+        serialize.set_escape_cache_size(2)
+        yield
+        serialize.set_escape_cache_size(serialize.DEFAULT_ESCAPE_CACHE_SIZE)
+
+    def test_repeated_texts_are_escaped_once(self):
+
+        class ul(E):
+
+            class li(E):
+                TEXT = 'a & b'
+
+            class li(E):  # noqa: F811
+                TEXT = 'a & b'
+
+            class li(E):  # noqa: F811
+                TEXT = 'c'
+
+        assert to_str(ul) == (
+                '<ul><li>a &amp; b</li><li>a &amp; b</li><li>c</li></ul>')
+
+        info = serialize.escape_cache_info()
+        assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+
+    def test_least_recently_used_texts_are_forgotten(self):
+        for text in ['a', 'b', 'c', 'a']:
+            to_str(Node('p', text))
+
+        info = serialize.escape_cache_info()
+        assert (info.hits, info.misses, info.maxsize) == (0, 4, 2)
+
+    def test_long_texts_are_not_cached(self):
+        text = '&' * 1000
+
+        assert to_str(E.p(text)) == '<p>' + '&amp;' * 1000 + '</p>'
+        assert serialize.escape_cache_info().currsize == 0
+
+
+class TestAsyncChunks:
+
+    @staticmethod
+    def get_list(size):
+
+        class ul(E):
+            pass
+
+        for i in range(size):
+
+            class ul(ul):  # noqa: F811
+
+                class li(E):
+                    TEXT = str(i)
+
+        return ul
+
+    @staticmethod
+    def collect(element, **kwargs):
+
+        async def main():
+            return [chunk async for chunk in ato_chunks(element, **kwargs)]
+
+        return asyncio.run(main())
+
+    @pytest.mark.parametrize('indent', ['', '  '])
+    def test_chunks_add_up_to_the_string(self, indent):
+        ul = self.get_list(10)
+
+        chunks = self.collect(ul, indent=indent, chunk_size=4, yield_every=3)
+
+        assert ''.join(chunks) == to_string(ul, indent=indent)
+        assert all(len(chunk) == 4 for chunk in chunks[:-1])
+
+    @pytest.mark.parametrize('indent', ['', '  '])
+    def test_compiled_output_is_streamed_once(self, indent):
+
+        class p(E):
+            TEXT = 'abc'
+
+        to_string(p, indent=indent, html_doctype=False)
+
+        chunks = self.collect(
+                p, indent=indent, html_doctype=False, yield_every=1)
+
+        assert ''.join(chunks) == to_string(
+                p, indent=indent, html_doctype=False)
+
+    def test_event_loop_is_not_blocked(self):
+        ul = self.get_list(100)
+        events = []
+
+        async def render():
+            async for _ in ato_chunks(ul, chunk_size=10 ** 6, yield_every=50):
+                events.append('chunk')
+
+        async def other_request():
+            await asyncio.sleep(0)
+            events.append('other')
+
+        async def main():
+            await asyncio.gather(render(), other_request())
+
+        asyncio.run(main())
+
+        assert events == ['other', 'chunk']
+
+
+class TestFragmentCache:
+
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self):
+        serialize.set_fragment_cache_size(2)
+        yield
+        serialize.set_fragment_cache_size(
+                serialize.DEFAULT_FRAGMENT_CACHE_SIZE)
+
+    @staticmethod
+    def get_page(nav, text):
+
+        class html(E):
+
+            class body(E):
+
+                TEXT = E(nav)
+
+                class p(E):
+                    TEXT = text
+
+        return html
+
+    @staticmethod
+    def get_nav():
+
+        @cacheable
+        class nav(E):
+
+            class a:
+                href = '/'
+                TEXT = 'Home'
+
+        return nav
+
+    def test_cacheable_element_is_rendered_once(self, monkeypatch):
+        nav = self.get_nav()
+
+        assert to_str(self.get_page(nav, 'foo')) == (
+                '<html><body><nav><a href="/">Home</a></nav>'
+                '<p>foo</p></body></html>')
+
+        monkeypatch.setattr(serialize, '_build_tags', _fail_for(nav))
+
+        assert to_str(self.get_page(nav, 'bar')) == (
+                '<html><body><nav><a href="/">Home</a></nav>'
+                '<p>bar</p></body></html>')
+
+        info = serialize.fragment_cache_info()
+        assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+    def test_indented_output_is_cached_per_indent_level(self):
+        nav = self.get_nav()
+
+        for text in ['foo', 'bar']:
+            for indent in ['  ', '\t']:
+                page = self.get_page(nav, text)
+                assert to_string(page, indent=indent) == textwrap.dedent(f"""
+                        <!DOCTYPE html>
+                        <html>
+                          <body>
+                            <nav>
+                              <a href="/">
+                                Home
+                              </a>
+                            </nav>
+                            <p>
+                              {text}
+                            </p>
+                          </body>
+                        </html>
+                        """).strip().replace('  ', indent)
+
+        info = serialize.fragment_cache_info()
+        assert (info.hits, info.misses) == (3, 1)
+
+    def test_least_recently_used_fragments_are_evicted(self):
+        navs = [self.get_nav() for _ in range(3)]
+
+        for nav in navs:
+            to_str(nav)
+
+        info = serialize.fragment_cache_info()
+        assert (info.evictions, info.maxsize, info.currsize) == (1, 2, 2)
+
+
+class TestLazyChildren:
+
+    def test_callables_and_iterators_are_evaluated_when_reached(self):
+        events = []
+
+        def rows():
+            for i in range(2):
+                events.append(f'row {i}')
+                yield Node('li', str(i))
+
+        class ul(E):
+
+            class li(E):
+                TEXT = 'first'
+
+            items = rows
+
+        chunks = iter_chunks(ul, html_doctype=False, chunk_size=1)
+        assert next(chunks) == '<'
+        assert events == []
+        assert ''.join(chunks) == (
+                'ul><li>first</li><li>0</li><li>1</li></ul>')
+        assert events == ['row 0', 'row 1']
+
+    def test_lazy_children_in_mixed_content(self):
+
+        class p(E):
+            TEXT = E(
+                    'foo',
+                    lambda: 'bar',
+                    iter(['<', E.b('baz')]),
+                    lambda: [Node('i', 'qux')],
+                    )
+
+        assert to_str(p) == '<p>foobar&lt;<b>baz</b><i>qux</i></p>'
+
+    def test_element_with_lazy_children_is_not_compiled(self):
+        values = iter(['foo', 'bar'])
+
+        class div(E):
+
+            class p(E):
+                TEXT = E(lambda: next(values))
+
+        assert div._static is False
+        assert div._trees_and_leaves[0]._static is False
+        assert to_str(div) == '<div><p>foo</p></div>'
+        assert to_string(div, indent='', html_doctype=False) == (
+                '<div><p>bar</p></div>')
+
+    def test_subclass_of_lazy_element_is_not_static(self):
+
+        class base(E):
+            rows = lambda: 'foo'  # noqa: E731
+
+        class derived(base):
+            pass
+
+        assert derived._static is False
+        assert E._static is True
+
+    def test_cacheable_element_with_lazy_children_is_not_cached(self):
+
+        @cacheable
+        class nav(E):
+            links = lambda: [Node('a', 'Home')]  # noqa: E731
+
+        assert to_str(nav) == to_str(nav) == '<nav><a>Home</a></nav>'
+        assert serialize.fragment_cache_info().currsize == 0
+
+    def test_unbounded_rows_are_streamed_in_constant_memory(self):
+        rows = (Node('li', str(i)) for i in itertools.count())
+
+        class ul(E):
+            items = rows
+
+        chunks = iter_chunks(ul, html_doctype=False, chunk_size=16)
+        assert next(chunks) == '<ul><li>0</li><l'
+        assert next(chunks) == 'i>1</li><li>2</l'
+
+
+def _fail_for(*elements):
+    build_tags = serialize._build_tags
+
+    def fail_for_given_elements(element):
+        if element in elements:
+            raise AssertionError(f'{element} should have been cached.')
+        return build_tags(element)
+
+    return fail_for_given_elements
+
+
+class TestBytes:
+
+    @staticmethod
+    def get_tree():
+
+        class html(E):
+
+            class body(E):
+
+                class p(E):
+                    TEXT = 'zażółć & gęślą'
+
+                class p(E):  # noqa: F811
+                    TEXT = 'jaźń\n'.encode()
+                    TEXT = b'<b>'
+
+                class pre(E):
+                    TEXT = b'a\nb'
+
+        return html
+
+    @pytest.mark.parametrize('indent', ['', '  '])
+    @pytest.mark.parametrize('html_doctype', [True, False])
+    def test_bytes_are_same_as_encoded_string(self, indent, html_doctype):
+        html = self.get_tree()
+
+        actual = to_bytes(html, indent=indent, html_doctype=html_doctype)
+
+        expected = to_string(html, indent=indent, html_doctype=html_doctype)
+        assert actual == expected.encode()
+        assert '<p>jaźń\n&lt;b&gt;</p>' in to_str(html)
+
+    def test_bytes_texts_without_special_characters_are_not_copied(self):
+        text = b'foo'
+
+        assert serialize._escape_bytes(text) is text
+        assert serialize._escape_bytes(b'"&"') == b'&quot;&amp;&quot;'
+
+    def test_bytearray_is_reused_and_grows_if_needed(self):
+        buffer = bytearray(b'-' * 10)
+
+        size = render_into(E.p('foo'), buffer, html_doctype=False)
+
+        assert size == 10
+        assert buffer == b'<p>foo</p>'
+
+        size = render_into(E.p('foo bar'), buffer, html_doctype=False)
+
+        assert size == 14
+        assert buffer == b'<p>foo bar</p>'
+
+        size = render_into(E.i('x'), buffer, html_doctype=False)
+
+        assert size == 8
+        assert buffer[:size] == b'<i>x</i>'
+        assert len(buffer) == 14
+
+    def test_memoryview_is_filled_up_to_its_size(self):
+        buffer = bytearray(40)
+        view = memoryview(buffer)
+
+        size = render_into(E.p('foo'), view, indent=' ')
+
+        assert buffer[:size] == to_string(E.p('foo'), indent=' ').encode()
+
+        with pytest.raises(ValueError):
+            render_into(E.p('foo'), view[:5], html_doctype=False)
+
+
+class TestProfiler:
+
+    @staticmethod
+    def get_tree():
+
+        class div(E):
+
+            TEXT = 'a & b'
+
+            class div(E):
+
+                class p(E):
+                    TEXT = 'foo\nbar'
+
+                class pre(E):
+                    TEXT = '<baz>'
+
+        return div
+
+    @pytest.mark.parametrize('indent', ['', '  '])
+    def test_output_is_not_affected(self, indent):
+        div = self.get_tree()
+
+        actual = to_string(div, indent=indent, profiler=RenderStats())
+
+        assert actual == to_string(div, indent=indent)
+
+    def test_stats_are_collected_per_tag_and_class(self):
+        div = self.get_tree()
+        stats = RenderStats()
+
+        to_str(div)
+        to_string(div, html_doctype=False, profiler=stats)
+
+        assert set(stats.by_tag) == {'div', 'p', 'pre'}
+        assert stats.by_tag['div'].nodes == 2
+        assert stats.by_tag['div'].chars == len(to_str(div))
+        assert stats.by_tag['div'].escapes == 3
+        assert stats.by_tag['p'].chars == len('<p>foo\nbar</p>')
+        assert stats.by_tag['pre'].escapes == 1
+        assert stats.by_class[div].nodes == 1
+        assert stats.by_class[div].chars == stats.by_tag['div'].chars
+        assert all(
+                s.seconds > 0 for s in stats.by_class.values())
+        assert len(stats.by_class) == 4
+
+    def test_stats_add_up_across_renders(self):
+        stats = RenderStats()
+
+        for _ in range(3):
+            to_string(E.p('foo'), indent=' ', profiler=stats)
+
+        assert stats.by_tag['p'].nodes == 3
+        assert stats.by_tag['p'].escapes == 3
+
+    def test_nodes_are_counted_together(self):
+        stats = RenderStats()
+        rows = [Node('tr', Node('td', str(i))) for i in range(100)]
+        table = Node('table', *rows)
+
+        to_string(table, profiler=stats)
+
+        assert set(stats.by_class) == {Node}
+        assert stats.by_class[Node].nodes == 201
+        assert stats.by_class[Node].chars == len(
+                to_string(table, html_doctype=False))
+        assert stats.by_tag['td'].nodes == 100
+
+
+class TestTreeStats:
+
+    @staticmethod
+    def get_tree():
+
+        class html(E):
+
+            class head(E):
+
+                class meta(E):
+                    charset = 'UTF-8'
+
+            class body(E):
+
+                class p(E):
+                    TEXT = 'zażółć & gęślą\nsecond line\n\n'
+                    class_ = 'a<b'
+
+                class pre(E):
+                    TEXT = '<x>\n  y'
+
+                class pre(E):
+                    pass
+
+                TEXT = E('foo ', E.b(b'bar'), Node('i', 'baz', id='i'))
+
+                class span(E):
+                    TEXT = ''
+
+        return html
+
+    @pytest.mark.parametrize('indent', ['', '  ', '\t', 'ż'])
+    @pytest.mark.parametrize('html_doctype', [True, False])
+    def test_length_and_size_are_exact(self, indent, html_doctype):
+        html = self.get_tree()
+        kwargs = dict(indent=indent, html_doctype=html_doctype)
+
+        tree_stats = stats(html, **kwargs)
+
+        assert tree_stats.length == len(to_string(html, **kwargs))
+        assert tree_stats.size == len(to_bytes(html, **kwargs))
+
+    def test_counts(self):
+        tree_stats = stats(self.get_tree())
+
+        assert tree_stats.nodes == 10
+        assert tree_stats.max_depth == 3
+        assert tree_stats.attribute_bytes == len(
+                ' charset="UTF-8" class="a&lt;b" id="i"')
+        assert tree_stats.text_bytes == len(
+                'zażółć &amp; gęślą\nsecond line\n\n'
+                '&lt;x&gt;\n  yfoo barbaz'.encode())
+
+    def test_classes_are_measured_once(self, monkeypatch):
+        html = self.get_tree()
+        expected = stats(html, indent='  ')
+
+        monkeypatch.setattr(serialize, '_build_tags', _fail_for(html))
+
+        assert stats(html, indent='  ') == expected
+
+        class page(E):
+            TEXT = E(html)
+
+        page_stats = stats(page)
+        monkeypatch.undo()
+        assert page_stats.length == len(to_string(page))
+
+    @pytest.mark.parametrize('indent', ['', '  ', 'ż'])
+    def test_frozen_trees_are_measured(self, indent):
+        html = self.get_tree()
+        frozen = freeze(html)
+
+        class page(E):
+
+            class body(E):
+                TEXT = 'x'
+                content = frozen
+
+        assert stats(frozen, indent=indent) == stats(html, indent=indent)
+        page_stats = stats(page, indent=indent)
+        assert page_stats.length == len(to_string(page, indent=indent))
+        assert page_stats.size == len(to_bytes(page, indent=indent))
+        assert page_stats.nodes == 12
+        assert page_stats.max_depth == 5
+
+    def test_lazy_children_cannot_be_measured(self):
+
+        class ul(E):
+            rows = lambda: [Node('li', 'foo')]  # noqa: E731
+
+        with pytest.raises(ValueError):
+            stats(ul)
+        with pytest.raises(ValueError):
+            stats(Node('ul', iter([])))
+
+    def test_deep_tree(self):
+        element = Node('b', 'leaf')
+        for _ in range(5 * sys.getrecursionlimit()):
+            element = Node('i', element)
+
+        assert stats(element).length == len(to_string(element))
+
+
+class TestFreeze:
+
+    @staticmethod
+    def get_tree():
+
+        class html(E):
+
+            class body(E):
+
+                class p(E):
+                    TEXT = 'zażółć & gęślą\nsecond line'
+                    class_ = 'a<b'
+
+                class pre(E):
+                    TEXT = '<x>\n  y'
+
+                class br(E):
+                    pass
+
+                TEXT = E('foo ', E.b(b'bar'), Node('i', 'baz', id='i'))
+
+                class p(E):
+                    TEXT = 'zażółć & gęślą\nsecond line'
+                    class_ = 'a<b'
+
+        return html
+
+    @pytest.mark.parametrize('indent', ['', '  '])
+    @pytest.mark.parametrize('html_doctype', [True, False])
+    def test_output_is_same_as_of_element(self, indent, html_doctype):
+        html = self.get_tree()
+        frozen = freeze(html)
+        kwargs = dict(indent=indent, html_doctype=html_doctype)
+
+        assert to_string(frozen, **kwargs) == to_string(html, **kwargs)
+        assert to_bytes(frozen, **kwargs) == to_bytes(html, **kwargs)
+        assert ''.join(iter_chunks(frozen, chunk_size=7, **kwargs)) == (
+                to_string(html, **kwargs))
+        assert to_string(frozen, profiler=RenderStats(), **kwargs) == (
+                to_string(html, **kwargs))
+
+    def test_records(self):
+
+        class ul(E):
+            id = 'list'
+
+            class li(E):
+                TEXT = 'a & b'
+
+            class li(E):
+                TEXT = 'a & b'
+
+            class hr(E):
+                pass
+
+        frozen = freeze(ul)
+
+        assert [(opcode.name, value) for opcode, value in frozen] == [
+                ('OPEN', Tag('ul', (('id', 'list'),), '<ul id="list">')),
+                ('OPEN', Tag('li', (), '<li>')),
+                ('TEXT', 'a &amp; b'),
+                ('CLOSE', '</li>'),
+                ('OPEN', Tag('li', (), '<li>')),
+                ('TEXT', 'a &amp; b'),
+                ('CLOSE', '</li>'),
+                ('VOID', Tag('hr', (), '<hr/>')),
+                ('CLOSE', '</ul>'),
+        ]
+        assert len(frozen) == 9
+        assert len(frozen._values) == 6
+
+    def test_frozen_tree_can_be_a_child(self):
+        nav = freeze(Node('nav', Node('a', 'Home', href='/')))
+
+        class body(E):
+            menu = nav
+
+            class div(E):
+                TEXT = E('x', nav)
+
+        assert to_string(body, indent='  ', html_doctype=False) == (
+                textwrap.dedent('''
+                        <body>
+                          <nav>
+                            <a href="/">
+                              Home
+                            </a>
+                          </nav>
+                          <div>
+                            x
+                            <nav>
+                              <a href="/">
+                                Home
+                              </a>
+                            </nav>
+                          </div>
+                        </body>
+                        ''').strip())
+        assert len(freeze(body)) == 2 + 2 * len(nav) + 3
+
+    def test_element_classes_are_released(self):
+        html = self.get_tree()
+        expected = to_string(html)
+        frozen = freeze(html)
+        html_ref = weakref.ref(html)
+
+        del html
+        gc.collect()
+
+        assert html_ref() is None
+        assert to_string(frozen) == expected
+
+    def test_lazy_children_cannot_be_frozen(self):
+        with pytest.raises(ValueError):
+            freeze(Node('p', lambda: 'foo'))
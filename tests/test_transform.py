@@ -0,0 +1,201 @@
+import pytest
+
+from htmlclasses import E, Node, serialize, to_string
+from htmlclasses.lib import svg
+from htmlclasses.transform import (
+        transform,
+        transform_at,
+        with_attributes,
+        with_children,
+        )
+
+
+def build_page():
+
+    class html(E):
+
+        class body(E):
+
+            class nav(E):
+
+                class a(E):
+                    href = '/'
+                    TEXT = 'Home'
+
+                class a(E):
+                    href = '/about'
+                    TEXT = 'About'
+
+            class main(E):
+                TEXT = E('Hello', E.b('world'))
+                note = Node('p', 'n', class_='note')
+
+    return html
+
+
+def children(element):
+    return list(element._trees_and_leaves)
+
+
+def test_unchanged_tree_is_not_copied():
+    html = build_page()
+    assert transform(html, lambda element: element) is html
+
+
+@pytest.mark.parametrize('indent', ['', '  '])
+def test_transform_shares_untouched_subtrees(indent):
+    html = build_page()
+
+    def visit(element):
+        if element.__name__ == 'b':
+            return with_children(element, 'you')
+        return element
+
+    new = transform(html, visit)
+
+    assert to_string(new, indent=indent) == to_string(
+            html, indent=indent).replace('world', 'you')
+    [body] = children(new)
+    [old_body] = children(html)
+    assert body is not old_body
+    assert children(body)[0] is children(old_body)[0]
+    assert children(body)[1] is not children(old_body)[1]
+
+
+def test_transform_removes_elements():
+    html = build_page()
+    new = transform(html, lambda e: None if e.__name__ == 'nav' else e)
+    assert to_string(new, html_doctype=False) == (
+            '<html><body><main>Hello<b>world</b>'
+            + '<p class="note">n</p></main></body></html>'
+    )
+
+
+def test_transform_replaces_with_text():
+    node = Node('p', Node('b', 'x'), 'y')
+    new = transform(node, lambda e: 'z' if e.__name__ == 'b' else e)
+    assert to_string(new, html_doctype=False) == '<p>zy</p>'
+
+
+def test_transform_leaves_lazy_children_alone():
+    calls = []
+
+    def rows():
+        calls.append(None)
+        yield Node('li', 'x')
+
+    class ul(E):
+        items = rows
+        TEXT = 'y'
+
+    new = transform(ul, lambda e: with_attributes(e, id='list'))
+    assert not calls
+    assert to_string(new, html_doctype=False) == (
+            '<ul id="list"><li>x</li>y</ul>')
+
+
+@pytest.mark.parametrize('indent', ['', '  '])
+def test_transform_at(indent):
+    html = build_page()
+    new = transform_at(
+            html, (0, 0, 1), lambda a: with_attributes(a, class_='active'))
+    assert to_string(new, indent=indent) == to_string(
+            html, indent=indent).replace(
+                    'href="/about"', 'href="/about" class="active"')
+    [body] = children(new)
+    [old_body] = children(html)
+    assert children(body)[1] is children(old_body)[1]
+    assert children(children(body)[0])[0] is children(
+            children(old_body)[0])[0]
+
+
+def test_transform_at_removes_element():
+    html = build_page()
+    new = transform_at(html, (0, 1, 2), lambda note: None)
+    assert to_string(new, html_doctype=False) == (
+            '<html><body><nav><a href="/">Home</a><a href="/about">About</a>'
+            + '</nav><main>Hello<b>world</b></main></body></html>'
+    )
+
+
+def test_transform_at_text_raises():
+    with pytest.raises(ValueError):
+        transform_at(build_page(), (0, 1, 0), lambda text: text)
+
+
+def test_with_attributes():
+
+    class a(E):
+        href = '/'
+        class_ = 'link'
+        TEXT = 'x'
+
+    new = with_attributes(a, class_=None, data_id=1)
+    assert to_string(new, html_doctype=False) == (
+            '<a href="/" data-id="1">x</a>')
+    assert to_string(a, html_doctype=False) == '<a href="/" class="link">x</a>'
+
+
+def test_with_attributes_of_node():
+    node = Node('td', 'x')
+    new = with_attributes(node, class_='c')
+    assert to_string(new, html_doctype=False) == '<td class="c">x</td>'
+    assert new.children == node.children
+    assert to_string(node, html_doctype=False) == '<td>x</td>'
+
+
+def test_shared_subtree_is_serialized_once(monkeypatch):
+    html = build_page()
+    edit = (0, 0, 0)
+    to_string(transform_at(html, edit, lambda a: with_children(a, 'Start')))
+
+    built = []
+    build_tags = serialize._build_tags
+    monkeypatch.setattr(
+            serialize,
+            '_build_tags',
+            lambda element: built.append(element.__name__)
+            or build_tags(element),
+    )
+    new = transform_at(html, edit, lambda a: with_children(a, 'Top'))
+    assert to_string(new, html_doctype=False) == (
+            '<html><body><nav><a href="/">Top</a><a href="/about">About</a>'
+            + '</nav><main>Hello<b>world</b><p class="note">n</p></main>'
+            + '</body></html>'
+    )
+    # The output of the shared `main` and second `a` is reused.
+    assert built == ['html', 'body', 'nav', 'a']
+
+
+def test_copies_keep_meta():
+    axes = svg.build_axes((0, 10), (0, 5), 100, 50, 'y', 'x')
+    new = with_attributes(axes, id='a')
+    assert new.META is axes.META
+    assert to_string(new) == to_string(axes).replace(
+            '(5 35)"', '(5 35)" id="a"', 1)
+
+
+def test_copies_keep_meta_of_bases():
+
+    class layout(E):
+        META = 'layout'
+        class_ = 'page'
+
+    class page(layout):
+        TEXT = 'x'
+
+    new = with_attributes(page, class_=None)
+    assert new.META == 'layout'
+    assert to_string(new, html_doctype=False) == '<page>x</page>'
+
+
+def test_kept_classes_are_marked_as_shared():
+    html = build_page()
+    [body] = children(html)
+    nav, main = children(body)
+    assert not main._shared
+
+    transform_at(html, (0, 0), lambda nav: with_attributes(nav, id='n'))
+
+    assert main._shared
+    assert not nav._shared